@@ -3,7 +3,7 @@ ReviewKit Backend - Main Flask Application
 A well-structured Flask application for managing and analyzing customer reviews using AI
 """
 
-from flask import Flask, current_app
+from flask import Flask
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
@@ -15,6 +15,10 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
+# Serialize JSON responses with orjson
+from json_provider import ORJSONProvider
+app.json = ORJSONProvider(app)
+
 # Enable CORS for all routes and origins
 CORS(app, resources={r"/*": {
     "origins": "*",
@@ -27,6 +31,8 @@ CORS(app, resources={r"/*": {
 
 # Configure SQLite database
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///data.sqlite'
+# Room for every statement the app issues in SQLAlchemy's compiled-SQL cache (default 500)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'query_cache_size': 1200}
 
 # Initialize database
 from models import db
@@ -36,12 +42,17 @@ db.init_app(app)
 from routes import register_routes
 register_routes(app)
 
-# Initialize database tables
-@app.before_request
-def initialize_database():
-    with current_app.app_context():
-        from db_utils import initialize_database
-        initialize_database()
+# Initialize database tables once at startup (also runs when imported by a WSGI server;
+# concurrently starting workers take turns through a lock file next to the database)
+from db_utils import configure_sqlite, initialize_database_once
+os.makedirs(app.instance_path, exist_ok=True)
+with app.app_context():
+    configure_sqlite(db.engine)
+    initialize_database_once(os.path.join(app.instance_path, 'schema.lock'))
+
+# Create the storage/ and logs/ output directories once instead of on every write
+from review_processor import ensure_data_dirs
+ensure_data_dirs()
 
 # Add CORS headers to all responses (additional safety layer)
 @app.after_request
@@ -54,9 +65,7 @@ def after_request(response):
 
 def main():
     """Main application entry point"""
-    # Create all tables
-    with app.app_context():
-        db.create_all()
+    # Tables are created at import time by initialize_database_once()
     
     # Parse command line arguments
     host = '127.0.0.1'  # Default to localhost
@@ -0,0 +1,69 @@
+"""
+Background chat jobs - run slow OpenAI work off the request thread
+"""
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, update
+from models import db, ChatJob
+
+# Bounded pool for long-running chat requests
+EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix='chat-job')
+
+# Finished jobs are kept this long so clients can still poll for the result
+JOB_TTL_SECONDS = 3600
+
+# Job state lives in the SQLite chat_jobs table, not in process memory, so a poll can be
+# answered by any Gunicorn worker, not only the one running the job
+
+def submit_job(app, func, *args):
+    """Record a pending job, run func(*args) on the executor inside an app context, return the job id
+    
+    func returns (payload, status_code); the worker running it stores the result in chat_jobs.
+    """
+    prune_jobs()
+    job_id = uuid.uuid4().hex
+    db.session.add(ChatJob(job_id=job_id, status='pending'))
+    db.session.commit()
+
+    def run():
+        with app.app_context():
+            try:
+                payload, status_code = func(*args)
+            except Exception as e:
+                db.session.rollback()
+                payload, status_code = {'response': f'Error: {str(e)}'}, 500
+            finish_job(job_id, payload, status_code)
+
+    EXECUTOR.submit(run)
+    return job_id
+
+def finish_job(job_id, payload, status_code):
+    """Store the result of a job"""
+    db.session.execute(
+        update(ChatJob)
+        .where(ChatJob.job_id == job_id)
+        .values(status='completed', payload=current_app.json.dumps(payload), status_code=status_code)
+    )
+    db.session.commit()
+
+def get_job(job_id):
+    """Get (status, payload, status_code) for a job, or None if the job is unknown or expired
+    
+    payload and status_code are None while the job is pending.
+    """
+    # populate_existing: the row is written by whichever worker runs the job
+    job = db.session.get(ChatJob, job_id, populate_existing=True)
+    if job is None or job.created_date < datetime.utcnow() - timedelta(seconds=JOB_TTL_SECONDS):
+        return None
+    if job.status != 'completed':
+        return job.status, None, None
+    return job.status, current_app.json.loads(job.payload), job.status_code
+
+def prune_jobs():
+    """Forget jobs older than JOB_TTL_SECONDS"""
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_TTL_SECONDS)
+    db.session.execute(delete(ChatJob).where(ChatJob.created_date < cutoff))
+    db.session.commit()
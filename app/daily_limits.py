@@ -2,18 +2,49 @@
 Daily API limits service
 """
 
+import threading
+from collections import namedtuple
+from cachetools import TTLCache
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from models import db, UserPlan, DailyUsage
 from datetime import datetime
 
+# Read-only snapshot of a company's plan, safe to share across requests
+PlanInfo = namedtuple('PlanInfo', ['plan_name', 'daily_limit'])
+
+# Plans rarely change, so they are cached in-process for a minute
+# (update_user_plan() drops the entry immediately in the worker that made the change)
+_plan_cache = TTLCache(maxsize=4096, ttl=60)
+_plan_cache_lock = threading.Lock()
+
 def get_or_create_user_plan(company_id):
     """Get or create a user plan for a company"""
     plan = UserPlan.query.filter_by(company_id=company_id).first()
     if not plan:
-        plan = UserPlan(company_id=company_id, plan_name='free', daily_limit=100)
-        db.session.add(plan)
+        # INSERT ... ON CONFLICT DO NOTHING, so concurrent first requests can't trip the unique constraint
+        db.session.execute(
+            sqlite_insert(UserPlan.__table__)
+            .values(company_id=company_id, plan_name='free', daily_limit=100)
+            .on_conflict_do_nothing(index_elements=['company_id'])
+        )
         db.session.commit()
+        plan = UserPlan.query.filter_by(company_id=company_id).first()
     return plan
 
+def get_plan_info(company_id):
+    """Get a company's plan name and daily limit (cached in-process)"""
+    with _plan_cache_lock:
+        plan_info = _plan_cache.get(company_id)
+    if plan_info is not None:
+        return plan_info
+    
+    plan = get_or_create_user_plan(company_id)
+    plan_info = PlanInfo(plan_name=plan.plan_name, daily_limit=plan.daily_limit)
+    with _plan_cache_lock:
+        _plan_cache[company_id] = plan_info
+    return plan_info
+
 def get_daily_usage(company_id, usage_date=None):
     """Get daily usage for a company on a specific date"""
     if usage_date is None:
@@ -21,28 +52,53 @@ def get_daily_usage(company_id, usage_date=None):
     
     usage = DailyUsage.query.filter_by(company_id=company_id, usage_date=usage_date).first()
     if not usage:
-        usage = DailyUsage(company_id=company_id, usage_date=usage_date, call_count=0)
-        db.session.add(usage)
+        # Same race-free create as get_or_create_user_plan(), on the (company_id, usage_date) constraint
+        db.session.execute(
+            sqlite_insert(DailyUsage.__table__)
+            .values(company_id=company_id, usage_date=usage_date, call_count=0)
+            .on_conflict_do_nothing(index_elements=['company_id', 'usage_date'])
+        )
         db.session.commit()
+        usage = DailyUsage.query.filter_by(company_id=company_id, usage_date=usage_date).first()
     return usage
 
 def check_daily_limit(company_id):
     """Check if company has exceeded daily limit"""
-    plan = get_or_create_user_plan(company_id)
+    plan = get_plan_info(company_id)
     usage = get_daily_usage(company_id)
     
     return usage.call_count < plan.daily_limit, usage.call_count, plan.daily_limit
 
 def increment_daily_usage(company_id):
-    """Increment daily usage count for a company"""
-    usage = get_daily_usage(company_id)
-    usage.call_count += 1
-    usage.last_reset = datetime.utcnow()
+    """Increment daily usage count for a company
+    
+    Done with a single UPDATE ... SET call_count = call_count + 1, so concurrent
+    requests can't overwrite each other's increments. RETURNING needs SQLAlchemy 2.x
+    and SQLite 3.35+ (declared in requirements.txt and checked by check_sqlite_version()).
+    """
+    usage_date = datetime.now().date()
+    table = DailyUsage.__table__
+    statement = (
+        update(table)
+        .where(table.c.company_id == company_id, table.c.usage_date == usage_date)
+        .values(call_count=table.c.call_count + 1, last_reset=datetime.utcnow())
+        .returning(table.c.call_count)
+    )
+    
+    call_count = db.session.execute(statement).scalar()
+    if call_count is None:
+        # No usage row for today yet
+        get_daily_usage(company_id, usage_date)
+        call_count = db.session.execute(statement).scalar()
     db.session.commit()
-    return usage.call_count
+    return call_count
 
 def reset_daily_usage_if_needed(company_id):
-    """Reset daily usage if it's a new day"""
+    """Reset daily usage if it's a new day
+    
+    Not needed before check_daily_limit() / increment_daily_usage(): usage is stored per
+    date, so get_daily_usage() already starts each day from a fresh zero-count row.
+    """
     today = datetime.now().date()
     usage = DailyUsage.query.filter_by(company_id=company_id, usage_date=today).first()
     
@@ -59,9 +115,8 @@ def reset_daily_usage_if_needed(company_id):
 
 def get_usage_status(company_id):
     """Get current usage status for a company"""
-    reset_daily_usage_if_needed(company_id)
     can_proceed, current_usage, daily_limit = check_daily_limit(company_id)
-    plan = get_or_create_user_plan(company_id)
+    plan = get_plan_info(company_id)
     
     return {
         'company_id': company_id,
@@ -80,6 +135,8 @@ def update_user_plan(company_id, plan_name='free', daily_limit=100):
     plan.daily_limit = daily_limit
     plan.updated_date = datetime.utcnow()
     db.session.commit()
+    with _plan_cache_lock:
+        _plan_cache.pop(company_id, None)
     
     return {
         'success': True,
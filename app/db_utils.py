@@ -3,10 +3,22 @@ Database utility functions
 """
 
 import os
+import sqlite3
+import threading
+from collections import namedtuple
 import pymysql
-from models import db, OpenAICreds, UserPlan, DailyUsage, SemanticAnalysis
+from cachetools import TTLCache
+from dbutils.pooled_db import PooledDB
+from sqlalchemy import event, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, OpenAICreds
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows: the app runs as a single process there, so no lock is needed
+    fcntl = None
+
 # MySQL configuration
 mysql_config = {
     'user': os.getenv('DB_USER'),
@@ -15,46 +27,315 @@ mysql_config = {
     'database': os.getenv('DB_NAME')
 }
 
+# Shared MySQL connection pool (created on first use)
+_mysql_pool = None
+_mysql_pool_lock = threading.Lock()
+
+def get_mysql_pool():
+    """Get the process-wide MySQL connection pool, creating it on first use"""
+    global _mysql_pool
+    if _mysql_pool is None:
+        with _mysql_pool_lock:
+            if _mysql_pool is None:
+                _mysql_pool = PooledDB(
+                    creator=pymysql,
+                    mincached=2,
+                    maxcached=10,
+                    maxconnections=20,
+                    blocking=True,
+                    ping=1,  # Check connections when taken from the pool
+                    **mysql_config
+                )
+    return _mysql_pool
+
 def get_mysql_connection():
-    """Get MySQL database connection"""
-    return pymysql.connect(
-        user=mysql_config['user'],
-        password=mysql_config['password'],
-        host=mysql_config['host'],
-        database=mysql_config['database']
+    """Get a pooled MySQL database connection (close() returns it to the pool)"""
+    return get_mysql_pool().connection()
+
+# Read-only snapshot of an OpenAICreds row, safe to share across requests
+CachedCreds = namedtuple('CachedCreds', [
+    'company_id', 'updated_date', 'assistant_id', 'file_id', 'vector_id', 'thread_id',
+    'review_count', 'latest_review_ts', 'doc_hash'
+])
+
+# In-process cache of OpenAICreds snapshots keyed by company_id. Each worker has its own copy,
+# so a change made by another worker (or by reset_company.py) is seen at most CREDS_CACHE_TTL
+# seconds late; code that is about to create OpenAI resources reads with fresh=True instead
+CREDS_CACHE_TTL = 30
+_creds_cache = TTLCache(maxsize=1024, ttl=CREDS_CACHE_TTL)
+_creds_cache_lock = threading.Lock()
+
+def _snapshot_creds(record):
+    """Copy the columns of an OpenAICreds record (or result row) into a CachedCreds tuple"""
+    return CachedCreds(
+        company_id=record.company_id,
+        updated_date=record.updated_date,
+        assistant_id=record.assistant_id,
+        file_id=record.file_id,
+        vector_id=record.vector_id,
+        thread_id=record.thread_id,
+        review_count=record.review_count,
+        latest_review_ts=record.latest_review_ts,
+        doc_hash=record.doc_hash
     )
 
+def get_openai_creds(company_id, fresh=False):
+    """Get the stored OpenAI resource ids for a company (cached in-process)
+    
+    With fresh=True the record is always read from the database (and the cache refreshed).
+    """
+    if not fresh:
+        with _creds_cache_lock:
+            creds = _creds_cache.get(company_id)
+        if creds is not None:
+            return creds
+    
+    # populate_existing: the record may have been written through Core since it was loaded
+    record = db.session.get(OpenAICreds, company_id, populate_existing=True)
+    if not record:
+        invalidate_openai_creds(company_id)
+        return None
+    
+    creds = _snapshot_creds(record)
+    with _creds_cache_lock:
+        _creds_cache[company_id] = creds
+    return creds
+
+def update_openai_creds(company_id, **fields):
+    """Update (or create) the OpenAICreds record for a company and refresh the cache
+    
+    Written with a single INSERT ... ON CONFLICT DO UPDATE, so concurrent first
+    requests for a company can't race on creating the record.
+    """
+    # Nothing changed - skip the write (and its fsync). Compared against a fresh read, not the
+    # in-process cache, which may be stale if another worker changed the record
+    record = db.session.get(OpenAICreds, company_id, populate_existing=True)
+    if record and all(getattr(record, name) == value for name, value in fields.items()):
+        creds = _snapshot_creds(record)
+        with _creds_cache_lock:
+            _creds_cache[company_id] = creds
+        return creds
+    
+    table = OpenAICreds.__table__
+    statement = sqlite_insert(table).values(company_id=company_id, **fields)
+    if fields:
+        statement = statement.on_conflict_do_update(index_elements=[table.c.company_id], set_=fields)
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=[table.c.company_id])
+    
+    try:
+        row = db.session.execute(statement.returning(*table.c)).one_or_none()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        invalidate_openai_creds(company_id)
+        raise
+    
+    # (no row is returned if the record was created concurrently and there was nothing to set)
+    if row is None:
+        invalidate_openai_creds(company_id)
+        return get_openai_creds(company_id)
+    
+    creds = _snapshot_creds(row)
+    with _creds_cache_lock:
+        _creds_cache[company_id] = creds
+    return creds
+
+def invalidate_openai_creds(company_id=None):
+    """Drop cached OpenAICreds for a company (or for all companies)"""
+    with _creds_cache_lock:
+        if company_id is None:
+            _creds_cache.clear()
+        else:
+            _creds_cache.pop(company_id, None)
+
+# INSERT/UPDATE ... RETURNING (update_openai_creds, increment_daily_usage) needs SQLite 3.35+
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+def check_sqlite_version():
+    """Fail fast if the linked SQLite library is too old for the statements the app issues"""
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))}+ is required "
+            f"(Python is linked against SQLite {sqlite3.sqlite_version})"
+        )
+
+def configure_sqlite(engine):
+    """Use WAL journaling with NORMAL sync on every new SQLite connection"""
+    check_sqlite_version()
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
 def check_and_create_table(table_name):
     """Check if table exists and create if it doesn't"""
     inspector = db.inspect(db.engine)
     if not inspector.has_table(table_name):
         db.create_all()
 
+def migrate_openai_creds_table():
+    """Rebuild openai_creds keyed by company_id if it still has the old integer id column"""
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table(OpenAICreds.__tablename__):
+        return
+    
+    columns = [column['name'] for column in inspector.get_columns(OpenAICreds.__tablename__)]
+    if 'id' not in columns:
+        return
+    
+    with db.engine.begin() as conn:
+        conn.execute(text("ALTER TABLE openai_creds RENAME TO openai_creds_old"))
+        OpenAICreds.__table__.create(conn)
+        conn.execute(text("""
+            INSERT INTO openai_creds (company_id, updated_date, assistant_id, file_id, vector_id, thread_id)
+            SELECT company_id, updated_date, assistant_id, file_id, vector_id, thread_id FROM openai_creds_old
+        """))
+        conn.execute(text("DROP TABLE openai_creds_old"))
+
+def migrate_openai_creds_columns():
+    """Add review fingerprint and document hash columns to an existing openai_creds table"""
+    inspector = db.inspect(db.engine)
+    if not inspector.has_table(OpenAICreds.__tablename__):
+        return
+    
+    columns = [column['name'] for column in inspector.get_columns(OpenAICreds.__tablename__)]
+    with db.engine.begin() as conn:
+        if 'review_count' not in columns:
+            conn.execute(text("ALTER TABLE openai_creds ADD COLUMN review_count INTEGER"))
+        if 'latest_review_ts' not in columns:
+            conn.execute(text("ALTER TABLE openai_creds ADD COLUMN latest_review_ts VARCHAR(32)"))
+        if 'doc_hash' not in columns:
+            conn.execute(text("ALTER TABLE openai_creds ADD COLUMN doc_hash VARCHAR(64)"))
+
 def initialize_database():
     """Initialize all database tables"""
-    check_and_create_table(OpenAICreds.__tablename__)
-    check_and_create_table(UserPlan.__tablename__)
-    check_and_create_table(DailyUsage.__tablename__)
-    check_and_create_table(SemanticAnalysis.__tablename__)
+    migrate_openai_creds_table()
+    migrate_openai_creds_columns()
+    # create_all() only creates the tables that are missing, in one pass
+    db.create_all()
 
-def fetch_reviews_for_company(conn, company_id):
-    """Fetch all reviews for a company and format them for vector store"""
+def initialize_database_once(lock_path):
+    """Run initialize_database() under an exclusive file lock
+    
+    Gunicorn workers all import the app at the same time; the lock makes them run the
+    migrations one after another, so later workers find the schema already up to date
+    instead of racing on the same DDL ("table already exists" / "database is locked").
+    """
+    with open(lock_path, 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            initialize_database()
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def fetch_company_summary(conn, company_id):
+    """Fetch company name, review count and latest review time in a single round-trip"""
     with conn.cursor() as cursor:
-        # Get company name
-        cursor.execute("SELECT location_title FROM tbl_location WHERE location_id = %s", (company_id,))
-        company_result = cursor.fetchone()
-        if not company_result:
-            return None, None
-        
-        company_name = company_result[0]
+        cursor.execute("""
+            SELECT l.location_title,
+                (SELECT COUNT(*) FROM tbl_location_review r
+                 WHERE r.location_id = l.location_id AND (r.is_deleted = 0 OR r.is_deleted IS NULL)),
+                (SELECT MAX(r.createTime) FROM tbl_location_review r
+                 WHERE r.location_id = l.location_id AND (r.is_deleted = 0 OR r.is_deleted IS NULL))
+            FROM tbl_location l
+            WHERE l.location_id = %s
+        """, (company_id,))
+        result = cursor.fetchone()
+        if not result:
+            return None, 0, None
         
-        # Get all reviews for the company
+        company_name, review_count, latest_review_time = result
+        return company_name, review_count, latest_review_time
+
+# Company summaries are reused for a few seconds so consecutive chat turns skip MySQL
+# (a new review shows up in the fingerprint at most COMPANY_SUMMARY_TTL seconds late)
+COMPANY_SUMMARY_TTL = 30
+_summary_cache = TTLCache(maxsize=1024, ttl=COMPANY_SUMMARY_TTL)
+_summary_cache_lock = threading.Lock()
+
+def get_company_summary(company_id):
+    """Get (company_name, review_count, latest_review_time), cached briefly in-process"""
+    with _summary_cache_lock:
+        summary = _summary_cache.get(company_id)
+    if summary is not None:
+        return summary
+    
+    conn = get_mysql_connection()
+    try:
+        summary = fetch_company_summary(conn, company_id)
+    finally:
+        conn.close()
+    
+    # Unknown companies aren't cached, so a newly added one is found right away
+    if summary[0]:
+        with _summary_cache_lock:
+            _summary_cache[company_id] = summary
+    return summary
+
+def fetch_rating_counts(conn, company_id):
+    """Count a company's reviews per star rating (aggregated in MySQL)
+    
+    Returns:
+        dict: rating -> number of reviews (None for unrated reviews)
+    """
+    with conn.cursor() as cursor:
         cursor.execute("""
-            SELECT displayName, starRating_number, comment, createTime, reviewId
-            FROM tbl_location_review 
+            SELECT starRating_number, COUNT(*)
+            FROM tbl_location_review
             WHERE location_id = %s AND (is_deleted = 0 OR is_deleted IS NULL)
-            ORDER BY createTime DESC
+            GROUP BY starRating_number
         """, (company_id,))
+        return {rating: count for rating, count in cursor.fetchall()}
+
+def fetch_reviews_for_company(conn, company_id):
+    """Fetch the company name and all reviews for a company in a single round-trip"""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT l.location_title, r.displayName, r.starRating_number, r.comment, r.createTime, r.reviewId
+            FROM tbl_location l
+            LEFT JOIN tbl_location_review r
+                ON r.location_id = l.location_id AND (r.is_deleted = 0 OR r.is_deleted IS NULL)
+            WHERE l.location_id = %s
+            ORDER BY r.createTime DESC
+        """, (company_id,))
+        
+        rows = cursor.fetchall()
+        if not rows:
+            return None, None
         
-        reviews = cursor.fetchall()
+        company_name = rows[0][0]
+        # A company without reviews comes back as a single row of NULL review columns
+        reviews = [row[1:] for row in rows if any(value is not None for value in row[1:])]
         return company_name, reviews
+
+def iter_reviews_for_company(company_id, limit=None):
+    """Stream a company's reviews (newest first) row by row on a pooled connection of its own
+    
+    Uses an unbuffered (server-side) cursor so large review sets are never held in memory at once.
+    With a limit, only the most recent reviews are read.
+    """
+    query = """
+        SELECT displayName, starRating_number, comment, createTime, reviewId
+        FROM tbl_location_review 
+        WHERE location_id = %s AND (is_deleted = 0 OR is_deleted IS NULL)
+        ORDER BY createTime DESC
+    """
+    params = (company_id,)
+    if limit is not None:
+        query += " LIMIT %s"
+        params += (limit,)
+    
+    conn = get_mysql_connection()
+    try:
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(query, params)
+            
+            for review in cursor:
+                yield review
+    finally:
+        conn.close()
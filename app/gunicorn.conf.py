@@ -0,0 +1,27 @@
+"""
+Gunicorn configuration for ReviewKit (Linux deployment)
+Run from the app directory: gunicorn -c gunicorn.conf.py app:app
+or from the project root:  gunicorn -c app/gunicorn.conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+# The app uses flat imports and relative storage/ and logs/ paths, so always run from app/
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Chat requests mostly wait on OpenAI, so each worker serves many of them as greenlets
+# (set GUNICORN_WORKER_CLASS=gthread to use OS threads instead, e.g. without gevent)
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = 1000
+threads = int(os.getenv('GUNICORN_THREADS', 8))  # Only used by the gthread worker
+
+# Keep connections from Nginx / clients open between requests
+keepalive = 75
+timeout = 120
+
+accesslog = '-'
+errorlog = '-'
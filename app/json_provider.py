@@ -0,0 +1,58 @@
+"""
+Flask JSON provider and Server-Sent Events frames backed by orjson
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# Pre-encoded Server-Sent Events framing
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+def sse_frame(payload):
+    """Encode a payload as a Server-Sent Events data frame (bytes)"""
+    return _SSE_PREFIX + orjson.dumps(payload) + _SSE_SUFFIX
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Serialize jsonify() responses with orjson, falling back to the stdlib encoder"""
+
+    def _dumps_bytes(self, obj, indent=False, sort_keys=False):
+        """Encode obj with orjson, using Flask's default() for types orjson doesn't handle"""
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as JSON (stdlib options orjson can't honor use the default encoder)"""
+        if kwargs.keys() - {'indent', 'separators', 'sort_keys'}:
+            return super().dumps(obj, **kwargs)
+
+        try:
+            return self._dumps_bytes(
+                obj,
+                indent=kwargs.get('indent'),
+                sort_keys=kwargs.get('sort_keys', self.sort_keys)
+            ).decode()
+        except (TypeError, orjson.JSONEncodeError):
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize data as JSON (stdlib options orjson can't honor use the default decoder)"""
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """Serialize the given arguments as JSON and return a response with the JSON mimetype"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+
+        try:
+            body = self._dumps_bytes(obj, indent=indent, sort_keys=self.sort_keys) + b"\n"
+        except (TypeError, orjson.JSONEncodeError):
+            return super().response(obj)
+
+        return self._app.response_class(body, mimetype=self.mimetype)
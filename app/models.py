@@ -5,19 +5,25 @@ Database models for ReviewKit application
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-# Initialize SQLAlchemy
-db = SQLAlchemy()
+# Initialize SQLAlchemy (committed objects keep their loaded values instead of being re-selected)
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
 class OpenAICreds(db.Model):
     """Model for storing OpenAI credentials and file associations"""
     __tablename__ = 'openai_creds'
-    id = db.Column(db.Integer, primary_key=True)
-    company_id = db.Column(db.String(80), unique=True, nullable=False)
+    # company_id is the natural key; WITHOUT ROWID keeps lookups to a single B-tree
+    __table_args__ = {'sqlite_with_rowid': False}
+    company_id = db.Column(db.String(80), primary_key=True)
     updated_date = db.Column(db.DateTime, nullable=True)
     assistant_id = db.Column(db.String(80), nullable=True)
     file_id = db.Column(db.String(80), nullable=True)
     vector_id = db.Column(db.String(80), nullable=True)
     thread_id = db.Column(db.String(80), nullable=True)
+    # Fingerprint of the reviews the current file was built from
+    review_count = db.Column(db.Integer, nullable=True)
+    latest_review_ts = db.Column(db.String(32), nullable=True)
+    # SHA-256 of the review document behind file_id
+    doc_hash = db.Column(db.String(64), nullable=True)
 
 class UserPlan(db.Model):
     """Model for storing user subscription plans and limits"""
@@ -53,4 +59,24 @@ class SemanticAnalysis(db.Model):
     updated_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     # Ensure one record per company (latest analysis)
-    __table_args__ = (db.UniqueConstraint('company_id', name='unique_company_analysis'),)
\ No newline at end of file
+    __table_args__ = (db.UniqueConstraint('company_id', name='unique_company_analysis'),)
+
+class SemanticCache(db.Model):
+    """Model for caching chat answers by question embedding"""
+    __tablename__ = 'semantic_cache'
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.String(80), nullable=False, index=True)
+    file_id = db.Column(db.String(80), nullable=True)  # Review file the answer was generated from
+    question = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=False)  # Normalized float32 vector
+    response = db.Column(db.Text, nullable=False)
+    created_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ChatJob(db.Model):
+    """Model for background chat jobs (shared by every server worker)"""
+    __tablename__ = 'chat_jobs'
+    job_id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending / completed
+    payload = db.Column(db.Text, nullable=True)  # JSON response body once completed
+    status_code = db.Column(db.Integer, nullable=True)
+    created_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -3,16 +3,104 @@ OpenAI service for handling AI interactions
 """
 
 import os
-import json
+import io
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from cachetools import TTLCache
 from openai import OpenAI, BadRequestError
 from models import db, OpenAICreds
-from review_processor import create_text_file_for_vector_store, clean_response_text, log_conversation
-from tools import get_latest_message, run_chat_streaming, create_assistant, get_assistant, start_new_chat, add_message, run_chat
+from db_utils import get_openai_creds, update_openai_creds, invalidate_openai_creds
+from review_processor import (
+    get_review_document,
+    create_text_file_for_vector_store,
+    review_text_filename,
+    clean_response_text,
+    log_conversation
+)
+from response_cache import (
+    embed_question,
+    get_exact_response,
+    store_exact_response,
+    invalidate_company_responses,
+    is_semantic_cacheable,
+    lookup_semantic_response,
+    store_semantic_response
+)
+from json_provider import sse_frame
+from tools import get_latest_message, run_chat_streaming, create_assistant, get_assistant, start_new_chat, add_message, run_chat, create_vector_store_from_file, update_assistant
+
+# Assistant prompt; only the company name varies between companies
+ASSISTANT_INSTRUCTIONS = """You are a review analyst for {company_name}. Use file search to analyze customer reviews.
+
+GREETINGS: Respond warmly (e.g., "Hi! How can I help you with {company_name}'s reviews today?")
+
+LANGUAGE: Say "The reviews show...", "Customers mentioned...", "I found X reviews...". Never mention a document, file, PDF, data or attachment.
+
+FORMAT:
+- List reviews on separate lines with blank lines between them, e.g. "1. **Name** - X stars on DD-MM-YYYY:\n   \"Comment...\""
+- Be concise but specific; include reviewer names, ratings and dates
+
+CONTEXT ISOLATION: Always search the file for fresh data and treat each question independently. Never count or quote reviews from earlier conversation turns.
+
+OFF-TOPIC QUESTIONS: Reply "Sorry, I can't answer questions not related to reviews. Feel free to ask about reviews, ratings, or customer feedback for {company_name}!\""""
+
+# Shared OpenAI client so HTTP keep-alive connections are reused across requests
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Get the process-wide OpenAI client (None if no API key is configured)"""
+    global _openai_client
+    if _openai_client is None:
+        open_ai_key = os.getenv('OPEN_AI_KEY')
+        if not open_ai_key:
+            return None
+        with _openai_client_lock:
+            if _openai_client is None:
+                _openai_client = OpenAI(
+                    api_key=open_ai_key,
+                    http_client=httpx.Client(
+                        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                        follow_redirects=True
+                    )
+                )
+    return _openai_client
+
+def review_fingerprint(fingerprint):
+    """Normalize a (review_count, latest_review_time) pair to the form stored on OpenAICreds"""
+    review_count, latest_review_ts = fingerprint
+    return review_count, str(latest_review_ts) if latest_review_ts is not None else None
+
+def reviews_changed(creds, fingerprint):
+    """Check whether a company's reviews differ from the ones its current file was built from"""
+    if fingerprint is None:
+        return False
+    return (creds.review_count, creds.latest_review_ts) != review_fingerprint(fingerprint)
+
+def needs_setup(creds, fingerprint):
+    """Check whether a chat turn would create or replace OpenAI resources for a company"""
+    if not creds or not (creds.assistant_id and creds.file_id and creds.vector_id and creds.thread_id):
+        return True
+    return reviews_changed(creds, fingerprint)
+
+# Assistants already checked to exist with the current prompt, keyed by assistant_id
+_assistant_cache = TTLCache(maxsize=4096, ttl=600)
+_assistant_cache_lock = threading.Lock()
+
+# Pool for independent OpenAI setup calls (file upload, assistant, thread)
+_setup_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='openai-setup')
+
+# Streamed tokens are coalesced into one SSE frame until either limit is reached
+SSE_COALESCE_CHARS = 64
+SSE_COALESCE_SECONDS = 0.05
 
 class OpenAIService:
     def __init__(self):
         self.open_ai_key = os.getenv('OPEN_AI_KEY')
-        self.client = OpenAI(api_key=self.open_ai_key) if self.open_ai_key else None
+        self.client = get_openai_client()
 
     def validate_api_key(self):
         """Validate if the OpenAI API key is valid and working"""
@@ -67,89 +155,81 @@ class OpenAIService:
             
             return validation_result
 
-    def setup_file_for_company(self, company_id, company_name, reviews):
-        """Set up file for a company with their reviews"""
+    def setup_file_for_company(self, company_id, company_name, load_reviews, fingerprint=None, current_file=None):
+        """Set up file for a company with their reviews
+        
+        Args:
+            current_file: Optional (file_id, doc_hash) of the company's existing file,
+                kept instead of uploading when the document comes out identical
+        
+        Returns:
+            tuple: (file_id, doc_hash), or (None, None) if the upload failed
+        """
         try:
-            from review_processor import create_review_document
-            # Create review document
-            document = create_review_document(company_name, reviews)
+            # Create review document (reused while the review fingerprint is unchanged)
+            document = get_review_document(company_id, company_name, load_reviews, fingerprint)
+            doc_hash = hashlib.sha256(document.encode('utf-8')).hexdigest()
+            if current_file and current_file[1] == doc_hash:
+                return current_file
             
-            # Create text file (temporarily using text instead of PDF)
-            text_file = create_text_file_for_vector_store(document, company_id)
+            # Keep a text copy in storage for traceability, written off the request path
+            # (temporarily using text instead of PDF)
+            text_file = review_text_filename(company_id)
+            _setup_executor.submit(create_text_file_for_vector_store, document, company_id, text_file)
             
-            # Upload text file to OpenAI
-            with open(text_file, 'rb') as f:
-                uploaded_file = self.client.files.create(
-                    file=f,
-                    purpose="assistants"
-                )
+            # Upload the document to OpenAI straight from memory
+            uploaded_file = self.client.files.create(
+                file=(os.path.basename(text_file), io.BytesIO(document.encode('utf-8')), 'text/plain'),
+                purpose="assistants"
+            )
             
-            return uploaded_file
+            return uploaded_file.id, doc_hash
             
         except Exception as e:
-            return None
-
-    def get_or_create_assistant(self, company_name, record):
-        """Get or create assistant for a company"""
-        assistant_name = f"Review Analyst for {company_name}"
-        assistant_description = f"AI assistant specialized in analyzing customer reviews for {company_name}"
-        assistant_instructions = f"""You are a review analyst for {company_name}. Use file search to analyze customer reviews.
+            return None, None
 
-        GREETINGS: Respond warmly (e.g., "Hi! How can I help you with {company_name}'s reviews today?")
-
-        LANGUAGE RULES:
-        ✓ Say: "The reviews show...", "Customers mentioned...", "I found X reviews..."
-        ✗ Never say: "document", "file", "PDF", "data", "attachment"
-
-        FORMAT RULES:
-        - List reviews on separate lines with blank lines between them
-        - Example: "1. **Name** - X stars on DD-MM-YYYY:\n   \"Comment...\"\n\n2. **Name**..."
-        - Be concise but specific
-        - Include reviewer names, ratings, dates from the data
-
-        CRITICAL - CONTEXT ISOLATION:
-        - ALWAYS search the file for fresh data - NEVER rely on conversation history
-        - When counting reviews, ONLY count reviews from the file search, NOT from previous messages
-        - Treat each question as independent - ignore reviews mentioned in previous conversation turns
-        - Example: If user asks "How many reviews?", search the file and count ONLY the reviews in the file, not reviews mentioned earlier in the conversation
-
-        GENERAL QUESTIONS:
-        For questions NOT related to reviews (like "What color is the sky?", "How are you?", etc.), respond politely:
-        "Sorry, I can't answer questions not related to reviews. Feel free to ask about reviews, ratings, or customer feedback for {company_name}!"
-
-        Search the file to answer all questions about reviews, ratings, trends, and feedback."""
-
-        # Create or reuse assistant
-        if not record.assistant_id:
-            assistant = create_assistant(self.client, assistant_name, assistant_description, assistant_instructions)
-            record.assistant_id = assistant.id
-            db.session.commit()
-        else:
-            try:
-                assistant = get_assistant(self.client, record.assistant_id)
-                # Update assistant instructions to ensure latest version is used
-                # This ensures the fix for context isolation is applied to all existing assistants
+    def ensure_assistant(self, company_name, assistant_id):
+        """Reuse (and refresh) an existing assistant or create a new one
+        
+        Only talks to OpenAI, so it is safe to run off the request thread.
+        
+        Returns:
+            tuple: (assistant, created)
+        """
+        # Reuse an assistant already checked by this process
+        if assistant_id:
+            with _assistant_cache_lock:
+                assistant = _assistant_cache.get(assistant_id)
+            if assistant is not None:
+                return assistant, False
+        
+        assistant_instructions = ASSISTANT_INSTRUCTIONS.format(company_name=company_name)
+        if not assistant_id:
+            return self.create_company_assistant(company_name, assistant_instructions), True
+        
+        try:
+            assistant = get_assistant(self.client, assistant_id)
+            # Update assistant instructions to ensure latest version is used
+            # This ensures the fix for context isolation is applied to all existing assistants
+            # (skipped once the assistant already has the current prompt)
+            if assistant.instructions != assistant_instructions:
                 self.client.beta.assistants.update(
                     assistant_id=assistant.id,
                     instructions=assistant_instructions
                 )
-            except Exception as e:
-                assistant = create_assistant(self.client, assistant_name, assistant_description, assistant_instructions)
-                record.assistant_id = assistant.id
-                db.session.commit()
-        
-        return assistant
+            with _assistant_cache_lock:
+                _assistant_cache[assistant_id] = assistant
+            return assistant, False
+        except Exception as e:
+            with _assistant_cache_lock:
+                _assistant_cache.pop(assistant_id, None)
+            return self.create_company_assistant(company_name, assistant_instructions), True
 
-    def get_or_create_thread(self, record):
-        """Get or create thread for a company"""
-        if not record.thread_id:
-            thread_id = start_new_chat(self.client)
-            record.thread_id = thread_id
-            db.session.commit()
-        else:
-            thread_id = record.thread_id
-        
-        return thread_id
+    def create_company_assistant(self, company_name, assistant_instructions):
+        """Create a new review analyst assistant for a company"""
+        assistant_name = f"Review Analyst for {company_name}"
+        assistant_description = f"AI assistant specialized in analyzing customer reviews for {company_name}"
+        return create_assistant(self.client, assistant_name, assistant_description, assistant_instructions)
 
     def validate_file(self, file_id):
         """Validate if a file exists and is accessible in OpenAI"""
@@ -159,109 +239,278 @@ class OpenAIService:
         except Exception as e:
             return False
 
-    def process_chat_request(self, company_id, user_input, company_name, reviews):
-        """Process a chat request for a company"""
+    def process_chat_request(self, company_id, user_input, company_name, load_reviews, fingerprint=None):
+        """Process a chat request for a company
+        
+        Args:
+            load_reviews: Callable returning the company's reviews; only invoked
+                when a new review file has to be uploaded
+            fingerprint: Optional (review_count, latest_review_time) of the company's
+                current reviews; a file built from different reviews is replaced
+        """
         # Check if we have existing file for this company
-        record = OpenAICreds.query.filter_by(company_id=company_id).first()
+        creds = get_openai_creds(company_id)
+        # Anything created below is decided from a fresh read: another worker may already have
+        # replaced the file or reset the company since this worker cached the record
+        if needs_setup(creds, fingerprint):
+            creds = get_openai_creds(company_id, fresh=True)
         
-        # Validate existing file or create new one
+        review_count, latest_review_ts = review_fingerprint(fingerprint) if fingerprint else (None, None)
+        
+        # The assistant doesn't depend on the file, so look it up (or create it) while
+        # the existing file is checked and, if needed, a new one is uploaded
+        assistant_future = _setup_executor.submit(
+            self.ensure_assistant, company_name, creds.assistant_id if creds else None
+        )
+        
+        # Validate existing file or create new one. If the reviews changed the document is
+        # rebuilt, but a still-valid file is kept when the document hash is unchanged
         file_is_valid = False
-        if record and record.file_id:
-            file_is_valid = self.validate_file(record.file_id)
+        current_file = None
+        if creds and creds.file_id:
+            if not reviews_changed(creds, fingerprint):
+                file_is_valid = self.validate_file(creds.file_id)
+            elif creds.doc_hash and self.validate_file(creds.file_id):
+                current_file = (creds.file_id, creds.doc_hash)
+        
+        # Everything (re)created below is persisted with a single commit
+        from datetime import datetime
+        fields = {}
+        needs_file = not creds or not creds.file_id or not file_is_valid
         
-        if not record or not record.file_id or not file_is_valid:
-            # Create new file
-            uploaded_file = self.setup_file_for_company(company_id, company_name, reviews)
+        if needs_file:
+            # The thread doesn't depend on the file either, so create it while the
+            # reviews are loaded and uploaded (a fresh thread, since older messages
+            # may still carry the previous file as an attachment)
+            thread_future = None
+            if not current_file or not creds.thread_id:
+                thread_future = _setup_executor.submit(start_new_chat, self.client)
             
-            if not uploaded_file:
-                return None, "Failed to create file"
+            # Create new file (or keep the current one if the document is unchanged)
+            file_id, doc_hash = self.setup_file_for_company(
+                company_id, company_name, load_reviews, fingerprint, current_file
+            )
+            file_replaced = bool(file_id) and (not creds or file_id != creds.file_id)
             
-            # Create or update record
-            if not record:
-                record = OpenAICreds(company_id=company_id)
-                db.session.add(record)
+            assistant, assistant_created = assistant_future.result()
+            if thread_future:
+                thread_id = thread_future.result()
+            else:
+                thread_id = start_new_chat(self.client) if file_replaced else creds.thread_id
             
-            record.file_id = uploaded_file.id
-            from datetime import datetime
-            record.updated_date = datetime.utcnow()
-            db.session.commit()
-
-        # Get or create assistant
-        assistant = self.get_or_create_assistant(company_name, record)
+            if file_replaced:
+                fields['file_id'] = file_id
+                fields['doc_hash'] = doc_hash
+                fields['updated_date'] = datetime.utcnow()
+            if file_id and fingerprint is not None:
+                fields['review_count'] = review_count
+                fields['latest_review_ts'] = latest_review_ts
+        else:
+            file_id = creds.file_id
+            file_replaced = False
+            
+            # Get or create assistant
+            assistant, assistant_created = assistant_future.result()
+            
+            # Get or create thread
+            thread_id = creds.thread_id or start_new_chat(self.client)
         
-        # Get or create thread
-        thread_id = self.get_or_create_thread(record)
+        # Index the review file once in a vector store attached to the assistant,
+        # so messages don't have to re-attach it
+        # (errors here are returned only after everything created so far has been recorded,
+        # so a retry reuses the uploaded file, thread and assistant instead of creating them again)
+        previous_vector_id = creds.vector_id if creds else None
+        previous_file_id = creds.file_id if creds else None
+        vector_id = previous_vector_id if not file_replaced else None
+        if file_replaced:
+            fields['vector_id'] = None
+        setup_error = None
+        if file_id and not vector_id:
+            try:
+                vector_id = create_vector_store_from_file(self.client, file_id, f"reviews_{company_id}").id
+                fields['vector_id'] = vector_id
+            except Exception as e:
+                setup_error = "Failed to create vector store"
+        if vector_id and (assistant_created or fields.get('vector_id') == vector_id):
+            try:
+                update_assistant(self.client, assistant.id, vector_id)
+            except Exception as e:
+                # Forget the unattached store, so the next turn indexes the file and attaches it again
+                if vector_id != previous_vector_id:
+                    _setup_executor.submit(self.client.vector_stores.delete, vector_id)
+                fields['vector_id'] = None
+                setup_error = "Failed to attach vector store"
+        
+        if assistant_created:
+            fields['assistant_id'] = assistant.id
+        if not creds or creds.thread_id != thread_id:
+            fields['thread_id'] = thread_id
+        if fields:
+            creds = update_openai_creds(company_id, **fields)
+        
+        # The assistant no longer searches the old vector store
+        if previous_vector_id and previous_vector_id != creds.vector_id:
+            _setup_executor.submit(self.client.vector_stores.delete, previous_vector_id)
+        # ... nor the review file it replaced (deleted once the new file_id is recorded)
+        if file_replaced and previous_file_id and previous_file_id != creds.file_id:
+            _setup_executor.submit(self.client.files.delete, previous_file_id)
+        
+        if needs_file:
+            if not file_id:
+                return None, "Failed to create file"
+            if file_replaced:
+                invalidate_company_responses(company_id)
+        if setup_error:
+            return None, setup_error
 
-        # Add user message to thread with file attachment
+        # Add user message to thread (the file is searched through the assistant's vector store)
         try:
-            add_message(self.client, thread_id, user_input, record.file_id)
+            add_message(self.client, thread_id, user_input)
         except Exception as e:
             # If adding message fails, it might be a thread issue
             # Try to create a new thread and retry
             thread_id = start_new_chat(self.client)
-            record.thread_id = thread_id
-            db.session.commit()
+            update_openai_creds(company_id, thread_id=thread_id)
             # Retry adding the message
-            add_message(self.client, thread_id, user_input, record.file_id)
+            add_message(self.client, thread_id, user_input)
 
         return assistant, thread_id
 
+    def embed_for_cache(self, user_input):
+        """Embed a question for the response cache (None if embedding fails)"""
+        try:
+            return embed_question(self.client, user_input)
+        except Exception as e:
+            return None
+
+    def lookup_cached_response(self, company_id, user_input, fingerprint=None):
+        """Find a cached answer to an identical or similar question about the current review file
+        
+        Returns:
+            tuple: (cached_response or None, question embedding or None)
+        """
+        creds = get_openai_creds(company_id)
+        if not creds or not creds.file_id or reviews_changed(creds, fingerprint):
+            return None, None
+        
+        cached_response = get_exact_response(company_id, creds.file_id, user_input)
+        if cached_response:
+            return cached_response, None
+        
+        # Follow-ups and other context-dependent questions skip the semantic cache (and the embedding)
+        if not is_semantic_cacheable(user_input):
+            return None, None
+        
+        embedding = self.embed_for_cache(user_input)
+        if embedding is not None:
+            cached_response = lookup_semantic_response(company_id, creds.file_id, user_input, embedding)
+        return cached_response, embedding
+
+    def cache_response(self, company_id, user_input, embedding, response):
+        """Cache an answer for repeated and similar follow-up questions"""
+        creds = get_openai_creds(company_id)
+        if creds and creds.file_id:
+            store_exact_response(company_id, creds.file_id, user_input, response)
+            if not is_semantic_cacheable(user_input):
+                return
+            if embedding is None:
+                embedding = self.embed_for_cache(user_input)
+            if embedding is not None:
+                store_semantic_response(company_id, creds.file_id, user_input, embedding, response)
+
     def reset_resources_for_recovery(self, company_id):
         """Reset all resources for a company to recover from errors"""
         try:
-            record = OpenAICreds.query.filter_by(company_id=company_id).first()
-            if record:
+            creds = get_openai_creds(company_id, fresh=True)
+            if creds:
                 # Clear the IDs to force recreation
-                record.assistant_id = None
-                record.thread_id = None
-                record.file_id = None
-                db.session.commit()
+                update_openai_creds(company_id, assistant_id=None, thread_id=None, file_id=None, vector_id=None)
+                with _assistant_cache_lock:
+                    _assistant_cache.pop(creds.assistant_id, None)
+                if creds.vector_id:
+                    _setup_executor.submit(self.client.vector_stores.delete, creds.vector_id)
                 return True
         except Exception as e:
             return False
     
-    def run_chat_streaming(self, company_id, user_input, company_name, reviews):
+    def run_chat_streaming(self, company_id, user_input, company_name, load_reviews, fingerprint=None):
         """Run streaming chat for a company"""
         max_recovery_attempts = 1  # Allow one recovery attempt
         
+        # Replay the answer to an identical or similar question about the same review file
+        try:
+            cached_response, embedding = self.lookup_cached_response(company_id, user_input, fingerprint)
+        except Exception as e:
+            cached_response, embedding = None, None
+        if cached_response:
+            log_conversation(company_id, company_name, user_input, cached_response)
+            # Replay in frames of the same size as a live stream, so clients render it the same way
+            for start in range(0, len(cached_response), SSE_COALESCE_CHARS):
+                yield sse_frame({'chunk': cached_response[start:start + SSE_COALESCE_CHARS]})
+            yield sse_frame({'done': True})
+            return
+        
         for recovery_attempt in range(max_recovery_attempts + 1):
             try:
-                assistant, thread_id = self.process_chat_request(company_id, user_input, company_name, reviews)
+                assistant, thread_id = self.process_chat_request(company_id, user_input, company_name, load_reviews, fingerprint)
                 if not assistant:
-                    yield f"data: {json.dumps({'error': 'Failed to process request'})}\n\n"
+                    yield sse_frame({'error': 'Failed to process request'})
                     return
 
                 # Stream the response
-                full_response = ""
+                response_parts = []
                 had_server_error = False
                 
+                # Tokens not yet sent; flushed as one frame once enough text or time has accumulated
+                pending_parts = []
+                pending_chars = 0
+                last_flush = time.monotonic()
+                
                 for chunk in run_chat_streaming(self.client, thread_id, assistant.id):
                     if chunk.startswith('[DONE]'):
-                        # Clean the final response and send completion
-                        cleaned_response = clean_response_text(full_response)
+                        # Send what is still pending, then clean the final response and send completion
+                        cleaned_chunk = clean_response_text("".join(pending_parts))
+                        if cleaned_chunk:
+                            yield sse_frame({'chunk': cleaned_chunk})
+                        cleaned_response = clean_response_text("".join(response_parts))
+                        self.cache_response(company_id, user_input, embedding, cleaned_response)
                         log_conversation(company_id, company_name, user_input, cleaned_response)
-                        yield f"data: {json.dumps({'done': True})}\n\n"
+                        yield sse_frame({'done': True})
                         return  # Success!
                         
                     elif chunk.startswith('[ERROR'):
+                        # Send what is still pending before reporting the error
+                        cleaned_chunk = clean_response_text("".join(pending_parts))
+                        if cleaned_chunk:
+                            yield sse_frame({'chunk': cleaned_chunk})
+                        pending_parts = []
+                        pending_chars = 0
+                        
                         # Check if this is a server error we can recover from
                         if 'server_error' in chunk.lower() and recovery_attempt < max_recovery_attempts:
                             had_server_error = True
                             if self.reset_resources_for_recovery(company_id):
-                                yield f"data: {json.dumps({'chunk': 'Recovering from error, please wait...'})}\n\n"
+                                yield sse_frame({'chunk': 'Recovering from error, please wait...'})
                                 break  # Break to retry with fresh resources
                         
                         # Not recoverable or final attempt
-                        yield f"data: {json.dumps({'error': chunk})}\n\n"
+                        yield sse_frame({'error': chunk})
                         return
                         
                     else:
-                        # Send chunk to client
-                        full_response += chunk
-                        # Clean chunk before sending
-                        cleaned_chunk = clean_response_text(chunk)
-                        if cleaned_chunk:  # Only send if chunk has content after cleaning
-                            yield f"data: {json.dumps({'chunk': cleaned_chunk})}\n\n"
+                        response_parts.append(chunk)
+                        pending_parts.append(chunk)
+                        pending_chars += len(chunk)
+                        
+                        now = time.monotonic()
+                        if pending_chars >= SSE_COALESCE_CHARS or now - last_flush >= SSE_COALESCE_SECONDS:
+                            # Clean the batch before sending (a citation split across two frames is not caught)
+                            cleaned_chunk = clean_response_text("".join(pending_parts))
+                            pending_parts = []
+                            pending_chars = 0
+                            last_flush = now
+                            if cleaned_chunk:  # Only send if chunk has content after cleaning
+                                yield sse_frame({'chunk': cleaned_chunk})
                 
                 # If we broke out due to server error, continue to retry
                 if had_server_error and recovery_attempt < max_recovery_attempts:
@@ -273,16 +522,22 @@ class OpenAIService:
                 error_msg = str(e)
                 if recovery_attempt < max_recovery_attempts and ('server' in error_msg.lower() or 'not found' in error_msg.lower()):
                     if self.reset_resources_for_recovery(company_id):
-                        yield f"data: {json.dumps({'chunk': 'Recovering from error, please wait...'})}\n\n"
+                        yield sse_frame({'chunk': 'Recovering from error, please wait...'})
                         continue
                 
-                yield f"data: {json.dumps({'error': error_msg})}\n\n"
+                yield sse_frame({'error': error_msg})
                 return
 
-    def run_chat_regular(self, company_id, user_input, company_name, reviews):
+    def run_chat_regular(self, company_id, user_input, company_name, load_reviews, fingerprint=None):
         """Run regular (non-streaming) chat for a company"""
         try:
-            assistant, thread_id = self.process_chat_request(company_id, user_input, company_name, reviews)
+            # Reuse the answer to an identical or similar question about the same review file
+            cached_response, embedding = self.lookup_cached_response(company_id, user_input, fingerprint)
+            if cached_response:
+                log_conversation(company_id, company_name, user_input, cached_response)
+                return cached_response, None
+
+            assistant, thread_id = self.process_chat_request(company_id, user_input, company_name, load_reviews, fingerprint)
             if not assistant:
                 return None, "Failed to process request"
 
@@ -291,17 +546,20 @@ class OpenAIService:
             
             if run_status.status == 'completed':
                 # Get the latest message
-                latest_message = get_latest_message(self.client, thread_id)
+                latest_message = get_latest_message(self.client, thread_id, run_status.id)
                 if latest_message and latest_message.content:
                     # Extract raw response from OpenAI
-                    raw_response = ""
-                    for content_block in latest_message.content:
-                        if hasattr(content_block, 'text') and content_block.text:
-                            raw_response += content_block.text.value
+                    raw_response = "".join(
+                        content_block.text.value for content_block in latest_message.content
+                        if getattr(content_block, 'text', None)
+                    )
                     
                     # Clean up file citation references
                     cleaned_response = clean_response_text(raw_response)
                     
+                    # Cache the answer for repeated and similar follow-up questions
+                    self.cache_response(company_id, user_input, embedding, cleaned_response)
+                    
                     # Log the conversation
                     log_conversation(company_id, company_name, user_input, cleaned_response)
                     
@@ -394,7 +652,7 @@ class OpenAIService:
                 # Delete vector store if exists
                 if record.vector_id:
                     try:
-                        self.client.beta.vector_stores.delete(record.vector_id)
+                        self.client.vector_stores.delete(record.vector_id)
                         print(f"✓ Deleted vector store: {record.vector_id}")
                     except Exception as e:
                         cleanup_report["errors"].append(f"Failed to delete vector store {record.vector_id}: {str(e)}")
@@ -410,6 +668,9 @@ class OpenAIService:
             
             # Commit all database deletions
             db.session.commit()
+            invalidate_openai_creds()
+            with _assistant_cache_lock:
+                _assistant_cache.clear()
             
             print("\n" + "="*50)
             print("CLEANUP SUMMARY")
@@ -487,7 +748,7 @@ class OpenAIService:
             # Delete vector store if exists
             if record.vector_id:
                 try:
-                    self.client.beta.vector_stores.delete(record.vector_id)
+                    self.client.vector_stores.delete(record.vector_id)
                     print(f"✓ Deleted vector store: {record.vector_id}")
                 except Exception as e:
                     cleanup_report["errors"].append(f"Failed to delete vector store: {str(e)}")
@@ -496,6 +757,9 @@ class OpenAIService:
             try:
                 db.session.delete(record)
                 db.session.commit()
+                invalidate_openai_creds(company_id)
+                with _assistant_cache_lock:
+                    _assistant_cache.pop(record.assistant_id, None)
                 cleanup_report["db_record_cleaned"] = True
                 print(f"✓ Cleaned database record for company: {company_id}")
             except Exception as e:
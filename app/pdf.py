@@ -1,25 +1,18 @@
 import hashlib
-import os
 import random
 import time
-import pymysql
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 from dotenv import load_dotenv
-import os
+from db_utils import get_mysql_connection
 
 load_dotenv()
 
 def generate_pdf_for_location(location_id):
     # Database connection setup
-    connection = pymysql.connect(
-        host=os.getenv('HOST'),
-        user=os.getenv('DB_USER'),
-        password=os.getenv('DB_PASSWORD'),
-        database=os.getenv('DB_NAME')
-    )
+    connection = get_mysql_connection()
 
     try:
         with connection.cursor() as cursor:
@@ -28,9 +21,9 @@ def generate_pdf_for_location(location_id):
             location_result = cursor.fetchone()
             location_name = location_result[0] if location_result else "Unknown Location"
 
-            # Fetch reviews for the given location
+            # Fetch reviews for the given location (only the columns written to the PDF)
             cursor.execute("""
-                SELECT displayName, starRating_number, comment, createTime, is_deleted 
+                SELECT displayName, comment, createTime
                 FROM tbl_location_review 
                 WHERE location_id = %s
             """, (location_id,))
@@ -65,7 +58,7 @@ def generate_pdf_for_location(location_id):
             pdf.setFont('DejaVu', 12)
             y = 750
 
-        customer_name, star_rating, comment, review_creation_time, is_deleted = review
+        customer_name, comment, review_creation_time = review
         pdf.drawString(x, y, f"Review Date: {review_creation_time}")
         y -= line_height
         pdf.drawString(x, y, f"Review Company: {location_name}")
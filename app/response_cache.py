@@ -0,0 +1,159 @@
+"""
+Chat response caching (exact question match and semantic lookup by question embedding)
+"""
+
+import math
+import operator
+import re
+import threading
+from array import array
+from datetime import datetime, timedelta
+from cachetools import LRUCache, TTLCache
+from models import db, SemanticCache
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+SIMILARITY_THRESHOLD = 0.92  # Minimum cosine similarity to reuse an answer
+CACHE_TTL = timedelta(hours=1)
+SEMANTIC_CANDIDATE_LIMIT = 200  # Most recent entries compared per lookup
+
+# Questions that depend on the conversation so far are never answered from either cache (the
+# same words ask something else in another thread); questions too short to mean anything on
+# their own are also kept out of the semantic cache
+_FOLLOW_UP_RE = re.compile(
+    r"\b(?:more|another|again|also|else|that|those|these|them|they|it|its|previous|above|continue|same)\b",
+    re.IGNORECASE
+)
+_MIN_SEMANTIC_WORDS = 3
+
+# Terms that change the answer even when two questions embed almost identically
+# ("show me 1-star reviews" vs "show me 5-star reviews"); cached answers must match them exactly
+_SPECIFIC_TERMS_RE = re.compile(
+    r"\d+|\b(?:one|two|three|four|five|six|seven|eight|nine|ten|first|last|latest|newest|oldest|recent"
+    r"|best|worst|top|bottom|positive|negative|good|bad|happy|unhappy|great|poor|highest|lowest|longest|shortest"
+    r"|today|yesterday|week|month|year|january|february|march|april|may|june|july|august|september"
+    r"|october|november|december|not|no|without)\b",
+    re.IGNORECASE
+)
+
+# Dot product of two float sequences (math.sumprod runs in C on Python 3.12+)
+_dot = getattr(math, 'sumprod', None) or (lambda a, b: sum(map(operator.mul, a, b)))
+
+def is_follow_up(question):
+    """Check whether a question refers back to the conversation ("tell me more", "what about those?")"""
+    return bool(_FOLLOW_UP_RE.search(question))
+
+def is_semantic_cacheable(question):
+    """Check whether a question is self-contained and informational enough for semantic reuse"""
+    return len(question.split()) >= _MIN_SEMANTIC_WORDS and not is_follow_up(question)
+
+def _specific_terms(question):
+    """Get the answer-changing terms of a question (numbers, ratings, polarity, time) as a set"""
+    return frozenset(term.lower() for term in _SPECIFIC_TERMS_RE.findall(question))
+
+# Exact-match answers keyed by (company_id, question, file_id)
+_exact_cache = TTLCache(maxsize=10_000, ttl=CACHE_TTL.total_seconds())
+_exact_cache_lock = threading.Lock()
+
+def get_exact_response(company_id, file_id, question):
+    """Return the cached answer for an identical question, or None on a miss (always for follow-ups)"""
+    if is_follow_up(question):
+        return None
+    with _exact_cache_lock:
+        return _exact_cache.get((company_id, question, file_id))
+
+def store_exact_response(company_id, file_id, question, response):
+    """Cache the answer for an exact question (follow-ups are not cached)"""
+    if is_follow_up(question):
+        return
+    with _exact_cache_lock:
+        _exact_cache[(company_id, question, file_id)] = response
+
+def invalidate_company_responses(company_id):
+    """Drop a company's exact-match answers (e.g. after its review file is regenerated)"""
+    with _exact_cache_lock:
+        for key in [key for key in _exact_cache.keys() if key[0] == company_id]:
+            _exact_cache.pop(key, None)
+
+# Question embeddings keyed by normalized question text (case and whitespace folded)
+_embedding_cache = LRUCache(maxsize=4096)
+_embedding_cache_lock = threading.Lock()
+
+def embed_question(client, question):
+    """Embed a question and return it as a unit-length float32 array (memoized per process)"""
+    key = " ".join(question.split()).lower()
+    with _embedding_cache_lock:
+        vector = _embedding_cache.get(key)
+    if vector is not None:
+        return vector
+
+    response = client.embeddings.create(model=EMBEDDING_MODEL, input=key)
+    vector = array('f', response.data[0].embedding)
+
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm:
+        vector = array('f', (x / norm for x in vector))
+
+    with _embedding_cache_lock:
+        _embedding_cache[key] = vector
+    return vector
+
+def lookup_semantic_response(company_id, file_id, question, embedding):
+    """Return a cached answer for a similar question, or None on a miss
+
+    Only informational questions (see is_semantic_cacheable) are looked up, and only against the
+    SEMANTIC_CANDIDATE_LIMIT most recent answers generated from the same review file within
+    CACHE_TTL whose question has the same specific terms.
+    """
+    if not is_semantic_cacheable(question):
+        return None
+
+    try:
+        cutoff = datetime.utcnow() - CACHE_TTL
+        entries = db.session.query(
+            SemanticCache.question, SemanticCache.embedding, SemanticCache.response
+        ).filter(
+            SemanticCache.company_id == company_id,
+            SemanticCache.file_id == file_id,
+            SemanticCache.created_date >= cutoff
+        ).order_by(SemanticCache.created_date.desc()).limit(SEMANTIC_CANDIDATE_LIMIT).all()
+
+        terms = _specific_terms(question)
+        best_score, best_response = 0.0, None
+        for cached_question, cached_embedding, cached_answer in entries:
+            if _specific_terms(cached_question) != terms:
+                continue
+            cached_vector = array('f')
+            cached_vector.frombytes(cached_embedding)
+            # Both vectors are normalized, so the dot product is the cosine similarity
+            score = _dot(cached_vector, embedding)
+            if score > best_score:
+                best_score, best_response = score, cached_answer
+
+        return best_response if best_score >= SIMILARITY_THRESHOLD else None
+
+    except Exception as e:
+        return None
+
+def store_semantic_response(company_id, file_id, question, embedding, response):
+    """Store an answer for later reuse and drop the company's expired entries"""
+    if not is_semantic_cacheable(question):
+        return
+
+    try:
+        cutoff = datetime.utcnow() - CACHE_TTL
+        SemanticCache.query.filter(
+            SemanticCache.company_id == company_id,
+            SemanticCache.created_date < cutoff
+        ).delete(synchronize_session=False)
+
+        db.session.add(SemanticCache(
+            company_id=company_id,
+            file_id=file_id,
+            question=question,
+            embedding=embedding.tobytes(),
+            response=response
+        ))
+        db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
@@ -2,68 +2,144 @@
 Review processing and document generation utilities
 """
 
+import atexit
 import os
 import re
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from cachetools import LRUCache
 from pdf import generate_pdf_for_location
 
+# Citation patterns removed from assistant responses (compiled once at import):
+# complete 【...†...】 source/file citations and [n] reference numbers within one string,
+# matched in a single pass together with the spaces before them (so no double space is left)
+_CITATION_RE = re.compile(r'[ \t]*(?:【[^】]*†[^】]*】|\[\d+\])')
+
+# Keywords that mark a logged answer as an error
+_ERROR_RE = re.compile(r'error|failed|not found|no response|no reviews found', re.IGNORECASE)
+
+# Today's YYYYMMDD stamp and the time (next local midnight) it stops being valid
+_today_cache = ('', 0.0)
+
+def _today_stamp():
+    """Get today's date as YYYYMMDD (formatted once per day)"""
+    global _today_cache
+    stamp, expires = _today_cache
+    now = time.time()
+    if now >= expires:
+        local_now = time.localtime(now)
+        stamp = time.strftime('%Y%m%d', local_now)
+        expires = time.mktime((local_now.tm_year, local_now.tm_mon, local_now.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        _today_cache = (stamp, expires)
+    return stamp
+
 def clean_response_text(text):
     """Remove ONLY citation references like 【4:0†source】 from text - keep everything else unchanged"""
-    # Remove patterns like 【4:0†source】, 【1:0†source】, etc.
-    cleaned_text = re.sub(r'【[^】]*†source】', '', text)
-    
-    # Remove patterns like 【4:0†reviews_134_20251020_131556.txt】, etc.
-    cleaned_text = re.sub(r'【[^】]*†[^】]*】', '', cleaned_text)
+    # Remove patterns like 【4:0†source】, 【4:0†reviews_134_20251020_131556.txt】, 【4:0†file】
+    # and [1], [2], etc. (most responses and streamed chunks have neither, so skip the regex then)
+    if '【' not in text and '[' not in text:
+        return text
+    cleaned_text = _CITATION_RE.sub('', text)
     
-    # Remove patterns like 【4:0†file】, etc.
-    cleaned_text = re.sub(r'【[^】]*†file】', '', cleaned_text)
-    
-    # Remove patterns like [1], [2], etc. that might be citation numbers
-    cleaned_text = re.sub(r'\[\d+\]', '', cleaned_text)
-    
-    # Return the text with ONLY citations removed - no other changes
+    # Return the text with ONLY citations (and the spaces before them) removed - no other changes
     return cleaned_text
 
-def create_review_document(company_name, reviews, max_reviews=500):
+# Most recent reviews included in a company's review document (for speed)
+MAX_DOCUMENT_REVIEWS = 500
+
+def create_review_document(company_name, reviews, max_reviews=MAX_DOCUMENT_REVIEWS, total_reviews=None):
     """Create a formatted document from reviews for vector store
     
     Args:
         company_name: Name of the company
-        reviews: List of reviews (already sorted by date DESC)
+        reviews: Iterable of reviews (already sorted by date DESC), consumed once
         max_reviews: Maximum number of reviews to include (for speed)
+        total_reviews: Optional total review count (e.g. from SQL); when omitted the
+            reviews beyond max_reviews are counted from the iterable
     """
-    if not reviews:
-        return f"Company: {company_name}\nNo reviews available."
+    reviews = iter(reviews or ())
+    
+    # Format reviews and calculate statistics in a single pass over the most recent ones
+    # (limited for speed; the input is already sorted DESC)
+    review_lines = []
+    rating_total = 0
+    rating_count = 0
+    for display_name, rating, comment, create_time, review_id in islice(reviews, max_reviews):
+        if rating is not None:
+            rating_total += rating
+            rating_count += 1
+        # Compact format: ID|Name|Rating|Date|Comment
+        review_lines.append(f"{review_id}|{display_name}|{rating}★|{create_time}|{comment}\n")
     
-    # Limit reviews for speed (use most recent ones since they're already sorted DESC)
-    total_reviews = len(reviews)
-    reviews_to_use = reviews[:max_reviews] if len(reviews) > max_reviews else reviews
+    if not review_lines:
+        return f"Company: {company_name}\nNo reviews available."
     
-    # Calculate statistics from limited set
-    ratings = [review[1] for review in reviews_to_use if review[1] is not None]
-    avg_rating = sum(ratings) / len(ratings) if ratings else 0
+    # Count the older reviews that didn't make the cut without keeping them
+    if total_reviews is None:
+        total_reviews = len(review_lines) + sum(1 for _ in reviews)
+    total_reviews = max(total_reviews, len(review_lines))
+    avg_rating = rating_total / rating_count if rating_count else 0
     
-    # Create compact document (faster file search)
-    document = f"Company: {company_name}\n"
+    # Create compact document (faster file search); parts are joined once at the end
+    header = f"Company: {company_name}\n"
     if total_reviews > max_reviews:
-        document += f"Showing {len(reviews_to_use)} most recent of {total_reviews} reviews | Avg: {avg_rating:.1f} stars\n\n"
+        header += f"Showing {len(review_lines)} most recent of {total_reviews} reviews | Avg: {avg_rating:.1f} stars\n\n"
     else:
-        document += f"Total: {len(reviews_to_use)} reviews | Avg: {avg_rating:.1f} stars\n\n"
+        header += f"Total: {len(review_lines)} reviews | Avg: {avg_rating:.1f} stars\n\n"
     
-    # Add individual reviews (compact format for speed)
-    for review in reviews_to_use:
-        display_name, rating, comment, create_time, review_id = review
-        # Compact format: ID|Name|Rating|Date|Comment
-        document += f"{review_id}|{display_name}|{rating}★|{create_time}|{comment}\n"
+    return header + "".join(review_lines)
+
+# Output directories (relative to the app directory)
+STORAGE_DIR = 'storage'
+LOGS_DIR = 'logs'
+
+def ensure_data_dirs():
+    """Create the storage and logs directories (called once at startup)"""
+    os.makedirs(STORAGE_DIR, exist_ok=True)
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
+def _storage_path(company_id, extension):
+    """Get a timestamped storage path for a company's review file"""
+    return f"{STORAGE_DIR}/reviews_{company_id}_{time.strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+def review_text_filename(company_id):
+    """Get the timestamped storage path for a company's review text file"""
+    return _storage_path(company_id, 'txt')
+
+# Rendered review documents keyed by (company_id, company_name, review_count, latest_review_time)
+_document_cache = LRUCache(maxsize=64)
+_document_cache_lock = threading.Lock()
+
+def get_review_document(company_id, company_name, load_reviews, fingerprint=None):
+    """Get a company's review document, reusing the last rendering while its reviews are unchanged
     
+    Args:
+        load_reviews: Callable returning the company's reviews; only invoked on a cache miss
+            (it only needs to return the MAX_DOCUMENT_REVIEWS most recent ones when a
+            fingerprint is given)
+        fingerprint: Optional (review_count, latest_review_time); without it nothing is cached
+    """
+    key = (company_id, company_name, *fingerprint) if fingerprint else None
+    if key:
+        with _document_cache_lock:
+            document = _document_cache.get(key)
+        if document is not None:
+            return document
+    
+    total_reviews = fingerprint[0] if fingerprint else None
+    document = create_review_document(company_name, load_reviews(), total_reviews=total_reviews)
+    
+    if key:
+        with _document_cache_lock:
+            _document_cache[key] = document
     return document
 
-def create_text_file_for_vector_store(document, company_id):
+def create_text_file_for_vector_store(document, company_id, filename=None):
     """Create a text file from the review document for vector store"""
-    filename = f"storage/reviews_{company_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-    
-    # Ensure storage directory exists
-    os.makedirs('storage', exist_ok=True)
+    filename = filename or review_text_filename(company_id)
     
     with open(filename, 'w', encoding='utf-8') as f:
         f.write(document)
@@ -72,10 +148,7 @@ def create_text_file_for_vector_store(document, company_id):
 
 def create_pdf_file_for_vector_store(document, company_id):
     """Create a PDF file from the review document for vector store"""
-    filename = f"storage/reviews_{company_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    
-    # Ensure storage directory exists
-    os.makedirs('storage', exist_ok=True)
+    filename = _storage_path(company_id, 'pdf')
     
     try:
         # Try to use the existing PDF generation function first
@@ -90,44 +163,153 @@ def create_pdf_file_for_vector_store(document, company_id):
         
         doc = SimpleDocTemplate(filename, pagesize=letter)
         styles = getSampleStyleSheet()
+        heading2_style = styles['Heading2']
+        heading3_style = styles['Heading3']
+        normal_style = styles['Normal']
         story = []
         
-        # Split document into paragraphs
-        lines = document.split('\n')
-        for line in lines:
-            if line.strip():
-                if line.startswith('Company:') or line.startswith('Total Reviews:') or line.startswith('Average Rating:'):
-                    story.append(Paragraph(line, styles['Heading2']))
-                elif line.startswith('Review #'):
-                    story.append(Paragraph(line, styles['Heading3']))
-                elif line.startswith('=') or line.startswith('-'):
-                    story.append(Spacer(1, 12))
-                else:
-                    story.append(Paragraph(line, styles['Normal']))
-                story.append(Spacer(1, 6))
+        # Consecutive body lines are grouped into a single paragraph
+        normal_lines = []
+        
+        def flush_normal_lines():
+            if normal_lines:
+                story.append(Paragraph("<br/>".join(normal_lines), normal_style))
+                normal_lines.clear()
+        
+        # Split document into paragraphs (headings carry their own spacing,
+        # so spacers are only added at section separators)
+        for line in document.split('\n'):
+            if not line.strip():
+                continue
+            
+            if line.startswith(('Company:', 'Total Reviews:', 'Average Rating:')):
+                flush_normal_lines()
+                story.append(Paragraph(line, heading2_style))
+            elif line.startswith('Review #'):
+                flush_normal_lines()
+                story.append(Paragraph(line, heading3_style))
+            elif line.startswith(('=', '-')):
+                flush_normal_lines()
+                story.append(Spacer(1, 12))
+            else:
+                normal_lines.append(line)
+        flush_normal_lines()
         
         doc.build(story)
         return filename
 
+# Chat log entries are appended by a background thread so requests never wait on file I/O
+_log_queue = queue.Queue(maxsize=10000)
+_log_writer = None
+_log_writer_lock = threading.Lock()
+# Held while a batch is written so a shutdown flush never runs alongside the writer
+_log_write_lock = threading.Lock()
+
+# Log files stay open between batches (buffered) and are flushed about once a second
+LOG_FLUSH_SECONDS = 1.0
+_LOG_HANDLE_LIMIT = 64
+_log_handles = OrderedDict()  # log_filename -> open file, least recently used first
+
+def _log_handle(log_filename):
+    """Get the open handle for a log file, closing the least recently used one past the limit"""
+    handle = _log_handles.pop(log_filename, None)
+    if handle is None:
+        handle = open(log_filename, 'a', encoding='utf-8', buffering=65536)
+        if len(_log_handles) >= _LOG_HANDLE_LIMIT:
+            _, oldest = _log_handles.popitem(last=False)
+            oldest.close()
+    _log_handles[log_filename] = handle
+    return handle
+
+def _flush_log_handles(close_all=False):
+    """Flush open log files, closing the ones from previous days (or all of them)"""
+    current_suffix = f"_{_today_stamp()}.txt"
+    for log_filename in list(_log_handles):
+        handle = _log_handles[log_filename]
+        try:
+            handle.flush()
+        except Exception as e:
+            pass
+        if close_all or not log_filename.endswith(current_suffix):
+            del _log_handles[log_filename]
+            try:
+                handle.close()
+            except Exception as e:
+                pass
+
+def _write_log_entries(batch):
+    """Append (log_filename, log_entry) pairs, writing each log file once"""
+    entries_by_file = {}
+    for log_filename, log_entry in batch:
+        entries_by_file.setdefault(log_filename, []).append(log_entry)
+    
+    for log_filename, entries in entries_by_file.items():
+        try:
+            _log_handle(log_filename).writelines(entries)
+        except Exception as e:
+            # Reopen the file on the next batch
+            handle = _log_handles.pop(log_filename, None)
+            if handle:
+                try:
+                    handle.close()
+                except Exception as e:
+                    pass
+
+def _drain_log_queue(batch):
+    """Move every entry currently queued into batch"""
+    while True:
+        try:
+            batch.append(_log_queue.get_nowait())
+        except queue.Empty:
+            return batch
+
+def _write_log_batches():
+    """Drain queued log entries and append them to their log files in batches"""
+    last_flush = time.monotonic()
+    while True:
+        try:
+            batch = [_log_queue.get(timeout=LOG_FLUSH_SECONDS)]
+        except queue.Empty:
+            batch = []
+        
+        with _log_write_lock:
+            if batch:
+                _write_log_entries(_drain_log_queue(batch))
+            now = time.monotonic()
+            if now - last_flush >= LOG_FLUSH_SECONDS:
+                _flush_log_handles()
+                last_flush = now
+
+def flush_conversation_logs():
+    """Write out any queued log entries and close the log files (registered to run at interpreter exit)"""
+    with _log_write_lock:
+        _write_log_entries(_drain_log_queue([]))
+        _flush_log_handles(close_all=True)
+
+def _ensure_log_writer():
+    """Start the background log writer (once per process)"""
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(target=_write_log_batches, name='chat-log-writer', daemon=True)
+                _log_writer.start()
+                # The writer is a daemon thread, so persist whatever is still queued on shutdown
+                atexit.register(flush_conversation_logs)
+
 def log_conversation(company_id, company_name, question, answer):
     """Log question and answer to a text file"""
     try:
-        # Create logs directory if it doesn't exist
-        logs_dir = 'logs'
-        os.makedirs(logs_dir, exist_ok=True)
-        
-        # Create a log file per company with date
-        current_date = datetime.now().strftime('%Y%m%d')
-        log_filename = f"{logs_dir}/chat_log_{company_id}_{current_date}.txt"
+        # Create a log file per company with date (logs/ is created at startup)
+        current_date = _today_stamp()
+        log_filename = f"{LOGS_DIR}/chat_log_{company_id}_{current_date}.txt"
         
         # Prepare log entry
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
         separator = "=" * 80
         
         # Detect if this is an error message
-        is_error = any(keyword in answer.lower() for keyword in [
-            'error', 'failed', 'not found', 'no response', 'no reviews found'
-        ])
+        is_error = bool(_ERROR_RE.search(answer))
         
         log_entry = f"\n{separator}\n"
         log_entry += f"Company: {company_name} (ID: {company_id})\n"
@@ -141,9 +323,12 @@ def log_conversation(company_id, company_name, question, answer):
         log_entry += f"ANSWER:\n{answer}\n\n"
         log_entry += f"{separator}\n"
         
-        # Append to log file
-        with open(log_filename, 'a', encoding='utf-8') as f:
-            f.write(log_entry)
+        # Queue the entry for the background writer (dropped if the queue is full)
+        _ensure_log_writer()
+        try:
+            _log_queue.put_nowait((log_filename, log_entry))
+        except queue.Full:
+            print(f"Chat log queue full - dropped log entry for company {company_id}")
         
     except Exception as e:
         pass
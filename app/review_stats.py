@@ -0,0 +1,102 @@
+"""
+Direct answers to simple rating statistics questions (answered from MySQL without an assistant run)
+"""
+
+import re
+from db_utils import get_mysql_connection, fetch_rating_counts
+
+# Only short, unambiguous questions are matched; anything else goes to the assistant
+_STAR_COUNT_RE = re.compile(
+    r"^\s*how many\s+([1-5])[\s-]*stars?(?:\s+(?:reviews?|ratings?))?"
+    r"(?:\s+(?:are there|do (?:we|i|you) have|did (?:we|i) get))?\s*\??\s*$",
+    re.IGNORECASE
+)
+_AVERAGE_RE = re.compile(
+    r"^\s*what(?:'s| is)\s+(?:the|our|my)\s+average\s+(?:star\s+)?rating\s*\??\s*$",
+    re.IGNORECASE
+)
+_DISTRIBUTION_RE = re.compile(
+    r"^\s*(?:what(?:'s| is)\s+(?:the|our|my)\s+)?(?:star\s+)?rating\s+distribution\s*\??\s*$",
+    re.IGNORECASE
+)
+_TOTAL_RE = re.compile(
+    r"^\s*how many\s+reviews\s*(?:are there|do (?:we|i|you) have|in total|total)?\s*\??\s*$",
+    re.IGNORECASE
+)
+
+def match_stats_question(question):
+    """Classify a statistics question
+
+    Returns:
+        tuple: (kind, star) where kind is 'star_count', 'average', 'distribution' or 'total',
+        or None for free-form questions
+    """
+    if not question:
+        return None
+
+    match = _STAR_COUNT_RE.match(question)
+    if match:
+        return 'star_count', int(match.group(1))
+    if _AVERAGE_RE.match(question):
+        return 'average', None
+    if _DISTRIBUTION_RE.match(question):
+        return 'distribution', None
+    if _TOTAL_RE.match(question):
+        return 'total', None
+    return None
+
+def _total_answer(company_name, total_reviews):
+    """Phrase the answer to a 'how many reviews' question"""
+    return f"I found {total_reviews} review{'s' if total_reviews != 1 else ''} for {company_name}."
+
+def answer_stats_question(company_id, company_name, question, review_count=None):
+    """Answer a simple rating statistics question, or return None to use the assistant
+
+    Args:
+        review_count: Optional review count already known from the company summary;
+            a 'total' question is then answered without querying MySQL
+    """
+    matched = match_stats_question(question)
+    if not matched:
+        return None
+    kind, star = matched
+
+    if kind == 'total' and review_count is not None:
+        return _total_answer(company_name, review_count)
+
+    try:
+        conn = get_mysql_connection()
+        try:
+            rating_counts = fetch_rating_counts(conn, company_id)
+        finally:
+            conn.close()
+    except Exception as e:
+        return None
+
+    total_reviews = sum(rating_counts.values())
+    rated = {}
+    for rating, count in rating_counts.items():
+        if rating is not None and 1 <= int(rating) <= 5:
+            rated[int(rating)] = rated.get(int(rating), 0) + count
+    rated_total = sum(rated.values())
+
+    if kind == 'star_count':
+        count = rated.get(star, 0)
+        return f"I found {count} {star}-star review{'s' if count != 1 else ''} for {company_name}."
+
+    if kind == 'total':
+        return _total_answer(company_name, total_reviews)
+
+    if not rated_total:
+        return f"The reviews for {company_name} don't include any star ratings yet."
+
+    average = sum(rating * count for rating, count in rated.items()) / rated_total
+    if kind == 'average':
+        return f"The reviews show an average rating of {average:.1f} stars for {company_name}, based on {rated_total} rated reviews."
+
+    # Rating distribution
+    lines = [f"Rating distribution for {company_name} ({rated_total} rated reviews, average {average:.1f} stars):", ""]
+    for rating in range(5, 0, -1):
+        count = rated.get(rating, 0)
+        lines.append(f"{rating} stars: {count} ({count / rated_total * 100:.0f}%)")
+    return "\n".join(lines)
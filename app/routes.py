@@ -2,19 +2,27 @@
 API routes for ReviewKit application
 """
 
-import json
 from flask import request, jsonify, Response, stream_with_context, current_app
-from models import db, OpenAICreds, SemanticAnalysis
-from db_utils import get_mysql_connection, fetch_reviews_for_company
+from models import db, SemanticAnalysis
+from db_utils import (
+    get_mysql_connection,
+    get_company_summary,
+    fetch_reviews_for_company,
+    iter_reviews_for_company,
+    get_openai_creds,
+    update_openai_creds
+)
 from daily_limits import (
-    reset_daily_usage_if_needed, 
     check_daily_limit, 
     increment_daily_usage,
     get_usage_status,
     update_user_plan
 )
 from openai_service import OpenAIService
-from review_processor import log_conversation
+from review_processor import log_conversation, MAX_DOCUMENT_REVIEWS
+from review_stats import answer_stats_question
+from chat_jobs import submit_job, get_job
+from json_provider import sse_frame
 from semantic_analyzer import SemanticAnalyzer
 from datetime import datetime
 
@@ -116,15 +124,13 @@ def register_routes(app):
     def reset_company(company_id):
         """Reset assistant and thread for a company (useful for troubleshooting)"""
         try:
-            record = OpenAICreds.query.filter_by(company_id=company_id).first()
-            if record:
-                old_assistant = record.assistant_id
-                old_thread = record.thread_id
+            creds = get_openai_creds(company_id, fresh=True)
+            if creds:
+                old_assistant = creds.assistant_id
+                old_thread = creds.thread_id
                 
                 # Clear the assistant and thread
-                record.assistant_id = None
-                record.thread_id = None
-                db.session.commit()
+                update_openai_creds(company_id, assistant_id=None, thread_id=None)
                 
                 return jsonify({
                     'success': True,
@@ -147,15 +153,15 @@ def register_routes(app):
     def clear_thread(company_id):
         """Clear conversation thread for a company (preserves assistant and files)"""
         try:
-            record = OpenAICreds.query.filter_by(company_id=company_id).first()
+            creds = get_openai_creds(company_id, fresh=True)
             
-            if not record:
+            if not creds:
                 return jsonify({
                     'success': True,
                     'message': f'No records found for company {company_id} (nothing to clear)'
                 })
             
-            old_thread_id = record.thread_id
+            old_thread_id = creds.thread_id
             
             # Create a new thread to start fresh conversation
             openai_service = OpenAIService()
@@ -169,8 +175,7 @@ def register_routes(app):
             new_thread_id = start_new_chat(openai_service.client)
             
             # Update the thread_id in the database
-            record.thread_id = new_thread_id
-            db.session.commit()
+            update_openai_creds(company_id, thread_id=new_thread_id)
             
             return jsonify({
                 'success': True,
@@ -221,8 +226,7 @@ def register_routes(app):
         if not company:
             return jsonify({'error': 'No company parameter provided'}), 400
 
-        # Check daily limit before processing
-        reset_daily_usage_if_needed(company)
+        # Check daily limit before processing (today's usage row is created on demand)
         can_proceed, current_usage, daily_limit = check_daily_limit(company)
         
         if not can_proceed:
@@ -234,98 +238,140 @@ def register_routes(app):
         if not openai_service.client:
             return jsonify({'error': 'OpenAI API key not configured'}), 500
 
-        conn = None
         company_name = None
 
         def generate():
-            nonlocal conn, company_name
+            nonlocal company_name
             try:
-                # Connect to MySQL and fetch reviews
-                conn = get_mysql_connection()
-                company_name, reviews = fetch_reviews_for_company(conn, company)
+                # Fetch company summary (cached briefly; reviews are loaded only if a file must be uploaded)
+                company_name, review_count, latest_review_time = get_company_summary(company)
                 
                 if not company_name:
-                    yield f"data: {json.dumps({'error': 'Company not found'})}\n\n"
+                    yield sse_frame({'error': 'Company not found'})
                     return
                 
-                if not reviews:
-                    yield f"data: {json.dumps({'error': f'No reviews found for {company_name}'})}\n\n"
+                if not review_count:
+                    yield sse_frame({'error': f'No reviews found for {company_name}'})
                     return
 
                 # Increment daily usage count
                 increment_daily_usage(company)
 
+                # Answer simple rating statistics questions directly from the review table
+                stats_answer = answer_stats_question(company, company_name, user_input, review_count)
+                if stats_answer:
+                    log_conversation(company, company_name, user_input, stats_answer)
+                    yield sse_frame({'chunk': stats_answer})
+                    yield sse_frame({'done': True})
+                    return
+
                 # Process the chat request
-                for chunk in openai_service.run_chat_streaming(company, user_input, company_name, reviews):
+                load_reviews = lambda: iter_reviews_for_company(company, limit=MAX_DOCUMENT_REVIEWS)
+                for chunk in openai_service.run_chat_streaming(
+                    company, user_input, company_name, load_reviews, (review_count, latest_review_time)
+                ):
                     yield chunk
 
             except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
-            finally:
-                if conn:
-                    conn.close()
+                yield sse_frame({'error': str(e)})
 
         return Response(stream_with_context(generate()), mimetype='text/event-stream')
 
-    @app.route('/chat', methods=['POST'])
-    def check_company():
-        """Regular chat endpoint"""
-        company = request.args.get('company')
-        user_input = request.json.get('message')
-
-        if not company:
-            return jsonify({'error': 'No company parameter provided'}), 400
-
-        # Check daily limit before processing
-        reset_daily_usage_if_needed(company)
+    def process_chat(company, user_input):
+        """Run a regular chat request and return (payload, status_code)"""
+        # Check daily limit before processing (today's usage row is created on demand)
         can_proceed, current_usage, daily_limit = check_daily_limit(company)
         
         if not can_proceed:
-            return jsonify({
+            return {
                 'response': f"You've reached your daily limit of {daily_limit} API calls. Please upgrade or try again tomorrow."
-            }), 429
+            }, 429
 
         openai_service = OpenAIService()
         if not openai_service.client:
-            return jsonify({'error': 'OpenAI API key not configured'}), 500
+            return {'error': 'OpenAI API key not configured'}, 500
 
-        conn = None
         company_name = None
 
         try:
-            # Connect to MySQL and fetch reviews
-            conn = get_mysql_connection()
-            company_name, reviews = fetch_reviews_for_company(conn, company)
+            # Fetch company summary (cached briefly; reviews are loaded only if a file must be uploaded)
+            company_name, review_count, latest_review_time = get_company_summary(company)
             
             if not company_name:
                 error_msg = 'Company not found'
                 log_conversation(company, 'Unknown Company', user_input, error_msg)
-                return jsonify({'response': error_msg}), 200
+                return {'response': error_msg}, 200
             
-            if not reviews:
+            if not review_count:
                 error_msg = f'No reviews found for {company_name}'
                 log_conversation(company, company_name, user_input, error_msg)
-                return jsonify({'response': error_msg}), 200
+                return {'response': error_msg}, 200
 
             # Increment daily usage count
             increment_daily_usage(company)
 
+            # Answer simple rating statistics questions directly from the review table
+            stats_answer = answer_stats_question(company, company_name, user_input, review_count)
+            if stats_answer:
+                log_conversation(company, company_name, user_input, stats_answer)
+                return {'response': stats_answer}, 200
+
             # Process the chat request
-            response, error = openai_service.run_chat_regular(company, user_input, company_name, reviews)
+            load_reviews = lambda: iter_reviews_for_company(company, limit=MAX_DOCUMENT_REVIEWS)
+            response, error = openai_service.run_chat_regular(
+                company, user_input, company_name, load_reviews, (review_count, latest_review_time)
+            )
             
             if error:
-                return jsonify({'response': error}), 500
+                return {'response': error}, 500
             else:
-                return jsonify({'response': response})
+                return {'response': response}, 200
 
         except Exception as e:
             error_msg = f'Error: {str(e)}'
             log_conversation(company, company_name or 'Unknown', user_input, error_msg)
-            return jsonify({'response': error_msg}), 500
+            return {'response': error_msg}, 500
 
-        finally:
-            if conn:
-                conn.close()
+    @app.route('/chat', methods=['POST'])
+    def check_company():
+        """Regular chat endpoint"""
+        company = request.args.get('company')
+        user_input = request.json.get('message')
+
+        if not company:
+            return jsonify({'error': 'No company parameter provided'}), 400
+
+        payload, status_code = process_chat(company, user_input)
+        return jsonify(payload), status_code
+
+    @app.route('/chat/async', methods=['POST'])
+    def submit_chat_job():
+        """Queue a regular chat request in the background and return a job id to poll"""
+        company = request.args.get('company')
+        user_input = request.json.get('message')
+
+        if not company:
+            return jsonify({'error': 'No company parameter provided'}), 400
+
+        job_id = submit_job(current_app._get_current_object(), process_chat, company, user_input)
+        return jsonify({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': f'/chat/status/{job_id}'
+        }), 202
+
+    @app.route('/chat/status/<job_id>', methods=['GET'])
+    def get_chat_job_status(job_id):
+        """Get the status (and result once finished) of a background chat job"""
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found or expired'}), 404
+
+        status, payload, status_code = job
+        if status != 'completed':
+            return jsonify({'job_id': job_id, 'status': status}), 202
+
+        return jsonify(dict(payload, job_id=job_id, status='completed')), status_code
 
     @app.route('/semantic-analysis/<company_id>', methods=['GET'])
     def get_semantic_analysis(company_id):
@@ -350,7 +396,7 @@ def register_routes(app):
                 }), 404
             
             # Parse the stored JSON data
-            analysis_data = json.loads(analysis.analysis_data)
+            analysis_data = current_app.json.loads(analysis.analysis_data)
             
             # Calculate radar data
             analyzer = SemanticAnalyzer()
@@ -378,8 +424,10 @@ def register_routes(app):
         try:
             # Fetch reviews from database
             conn = get_mysql_connection()
-            company_name, reviews = fetch_reviews_for_company(conn, company_id)
-            conn.close()
+            try:
+                company_name, reviews = fetch_reviews_for_company(conn, company_id)
+            finally:
+                conn.close()  # Return the connection to the pool even if the query fails
             
             if not company_name:
                 return jsonify({
@@ -402,7 +450,7 @@ def register_routes(app):
                 # Update existing analysis
                 existing_analysis.company_name = company_name
                 existing_analysis.total_reviews = len(reviews)
-                existing_analysis.analysis_data = json.dumps(analysis_result)
+                existing_analysis.analysis_data = current_app.json.dumps(analysis_result)
                 existing_analysis.updated_date = datetime.utcnow()
             else:
                 # Create new analysis
@@ -410,7 +458,7 @@ def register_routes(app):
                     company_id=company_id,
                     company_name=company_name,
                     total_reviews=len(reviews),
-                    analysis_data=json.dumps(analysis_result)
+                    analysis_data=current_app.json.dumps(analysis_result)
                 )
                 db.session.add(new_analysis)
             
@@ -448,7 +496,7 @@ def register_routes(app):
                 }), 404
             
             # Parse the stored JSON data
-            analysis_data = json.loads(analysis.analysis_data)
+            analysis_data = current_app.json.loads(analysis.analysis_data)
             
             # Create summary with counts only
             summary = {
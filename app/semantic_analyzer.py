@@ -1,5 +1,5 @@
 import json
-from openai import OpenAI
+from openai_service import get_openai_client
 import os
 from datetime import datetime
 
@@ -15,12 +15,12 @@ class SemanticAnalyzer:
     
     def __init__(self):
         self.open_ai_key = os.getenv('OPEN_AI_KEY')
-        # Add timeout to OpenAI client (60 seconds)
-        self.client = OpenAI(
-            api_key=self.open_ai_key,
+        # Add timeout to the shared OpenAI client (60 seconds)
+        client = get_openai_client()
+        self.client = client.with_options(
             timeout=60.0,  # 60 second timeout
             max_retries=2  # Retry failed requests
-        ) if self.open_ai_key else None
+        ) if client else None
         self.detected_business_type = None
         self.dynamic_topics = None
     
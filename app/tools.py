@@ -33,18 +33,20 @@ def get_chat(client, thread_id):
     return thread
 
 # Description: "Add a message to a chat/Thread" 
+# (the review file normally lives in the assistant's vector store, so no attachment is needed)
 
-def add_message(client, thread, content, file_id):
+def add_message(client, thread, content, file_id=None):
+    attachments = []
+    if file_id:
+        attachments.append({
+            "file_id": file_id.id if hasattr(file_id, "id") else file_id,
+            "tools": [{"type": "file_search"}]
+        })
     thread_message = client.beta.threads.messages.create(
     thread_id = thread,
     role="user",
     content=content,
-    attachments=[
-            {
-                "file_id": file_id.id if hasattr(file_id, "id") else file_id,
-                "tools": [{"type": "file_search"}]
-            }
-        ],
+    attachments=attachments,
     )
     return thread_message
 
@@ -129,17 +131,19 @@ def upload_file(client, file):
     return run
 
 #Upload file
-def create_vector_store_from_file(client, file_id, name):
-    # Create vector store
-    vector_store = client.beta.vector_stores.create(
-        name=name
+def create_vector_store_from_file(client, file_id, name, max_wait_time=60):
+    # Create vector store with the file in a single call
+    vector_store = client.vector_stores.create(
+        name=name,
+        file_ids=[file_id.id if hasattr(file_id, "id") else file_id]
     )
     
-    # Add file to vector store
-    client.beta.vector_stores.files.create(
-        vector_store_id=vector_store.id,
-        file_id=file_id.id if hasattr(file_id, "id") else file_id
-    )
+    # Wait for the file to be indexed so the first search sees it
+    elapsed_time = 0
+    while vector_store.file_counts.in_progress and elapsed_time < max_wait_time:
+        time.sleep(1)
+        elapsed_time += 1
+        vector_store = client.vector_stores.retrieve(vector_store.id)
     
     return vector_store
 
@@ -187,8 +191,13 @@ def find_and_convert_dates(text):
 
     return converted_dates
 
-def get_latest_message(client, thread_id):
-    messages = client.beta.threads.messages.list(thread_id=thread_id)
+def get_latest_message(client, thread_id, run_id=None):
+    # Only fetch the newest message(s) instead of a full page of thread history;
+    # when the run is known, only that run's messages are listed
+    if run_id:
+        messages = client.beta.threads.messages.list(thread_id=thread_id, run_id=run_id, order='desc', limit=1)
+    else:
+        messages = client.beta.threads.messages.list(thread_id=thread_id, order='desc', limit=5)
     if messages.data:
         # Return the latest assistant message, not user message
         # messages.data is already in reverse chronological order (newest first)
@@ -40,7 +40,8 @@ def reset_company(company_id):
     print(f"  Thread ID: CLEARED (will be recreated)")
     print(f"  File ID: KEPT (still valid)")
     print()
-    print("Next time you send a message for this company, a fresh assistant and thread will be created.")
+    print("Running server workers may keep using the cached ids for up to 30 seconds; after that,")
+    print("the next message for this company creates a fresh assistant and thread.")
     
     return True
 
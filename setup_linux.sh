@@ -175,7 +175,7 @@ After=network.target
 User=root
 WorkingDirectory=$PROJECT_DIR/app
 Environment="PATH=$PROJECT_DIR/venv/bin"
-ExecStart=$PROJECT_DIR/venv/bin/gunicorn --workers 3 --bind 127.0.0.1:8000 app:app --timeout 120
+ExecStart=$PROJECT_DIR/venv/bin/gunicorn -c gunicorn.conf.py app:app
 Restart=always
 RestartSec=10
 StandardOutput=journal
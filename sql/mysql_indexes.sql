@@ -0,0 +1,15 @@
+-- =========================================================================
+-- ReviewKit - MySQL indexes for the review tables
+-- =========================================================================
+-- Run once against the reviews database (DB_NAME in .env):
+--   mysql -h $HOST -u $DB_USER -p $DB_NAME < sql/mysql_indexes.sql
+-- =========================================================================
+
+-- Serves the per-company MAX(createTime) / COUNT(*) summary used on every
+-- chat request and the "ORDER BY createTime DESC" review fetch without
+-- scanning or sorting all of the location's rows. is_deleted is part of the
+-- key so the "(is_deleted = 0 OR is_deleted IS NULL)" filter is checked from
+-- the index itself (the summary subqueries never touch the table rows),
+-- while createTime stays second so the rows come out already ordered.
+CREATE INDEX idx_locrev_loc_ctime
+    ON tbl_location_review (location_id, createTime DESC, is_deleted);
@@ -33,8 +33,8 @@ cd app
 echo "  Starting server on all network interfaces..."
 echo ""
 
-# Run Flask with public access
-python3.13 app.py --host 0.0.0.0 --port 8000
+# Run with Gunicorn (gevent workers, see app/gunicorn.conf.py) with public access
+GUNICORN_BIND=0.0.0.0:8000 gunicorn -c gunicorn.conf.py app:app
 
 # Pause equivalent
 read -p "Press Enter to continue..."
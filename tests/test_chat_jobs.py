@@ -0,0 +1,76 @@
+"""
+Background chat jobs stored in SQLite (chat_jobs.py)
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+flask = pytest.importorskip("flask")
+pytest.importorskip("flask_sqlalchemy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from models import db, ChatJob
+import chat_jobs
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'jobs.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _wait_for(job_id):
+    """Poll until the job has completed (it runs on the executor thread)"""
+    for _ in range(500):
+        if chat_jobs.get_job(job_id)[0] == "completed":
+            return
+        time.sleep(0.01)
+
+
+def test_pending_job_then_completed_result(app):
+    release = threading.Event()
+
+    def work(company, message):
+        release.wait(5)
+        return {"response": f"{company}: {message}"}, 200
+
+    job_id = chat_jobs.submit_job(app, work, "134", "hi")
+    assert chat_jobs.get_job(job_id) == ("pending", None, None)
+
+    release.set()
+    _wait_for(job_id)
+
+    assert chat_jobs.get_job(job_id) == ("completed", {"response": "134: hi"}, 200)
+
+
+def test_result_is_visible_to_another_worker(app):
+    job_id = chat_jobs.submit_job(app, lambda: ({"response": "ok"}, 200))
+    _wait_for(job_id)
+
+    # A separate connection stands in for another Gunicorn worker reading the same database
+    with db.engine.connect() as conn:
+        row = conn.execute(db.select(ChatJob.status, ChatJob.status_code).where(ChatJob.job_id == job_id)).one()
+    assert tuple(row) == ("completed", 200)
+
+
+def test_failed_job_is_stored_as_error(app):
+    def fail():
+        raise ValueError("boom")
+
+    job_id = chat_jobs.submit_job(app, fail)
+    _wait_for(job_id)
+
+    assert chat_jobs.get_job(job_id) == ("completed", {"response": "Error: boom"}, 500)
+
+
+def test_unknown_job(app):
+    assert chat_jobs.get_job("missing") is None
@@ -0,0 +1,101 @@
+"""
+Startup migrations of the openai_creds table (db_utils.py)
+"""
+
+import os
+import sys
+
+import pytest
+
+flask = pytest.importorskip("flask")
+pytest.importorskip("flask_sqlalchemy")
+pytest.importorskip("pymysql")
+pytest.importorskip("dbutils")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from sqlalchemy import text
+
+from models import db
+from db_utils import initialize_database, migrate_openai_creds_table
+
+# openai_creds as created before it was keyed by company_id
+OLD_TABLE = """
+    CREATE TABLE openai_creds (
+        id INTEGER NOT NULL PRIMARY KEY,
+        company_id VARCHAR(80) NOT NULL UNIQUE,
+        updated_date DATETIME,
+        assistant_id VARCHAR(80),
+        file_id VARCHAR(80),
+        vector_id VARCHAR(80),
+        thread_id VARCHAR(80)
+    )
+"""
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'data.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def _columns():
+    return [column["name"] for column in db.inspect(db.engine).get_columns("openai_creds")]
+
+
+def test_old_table_is_rebuilt_keyed_by_company_id(app):
+    with db.engine.begin() as conn:
+        conn.execute(text(OLD_TABLE))
+        conn.execute(text("""
+            INSERT INTO openai_creds (id, company_id, updated_date, assistant_id, file_id, vector_id, thread_id)
+            VALUES (1, '134', '2024-01-02 03:04:05', 'asst_1', 'file-1', 'vs_1', 'thread_1'),
+                   (2, '135', NULL, NULL, NULL, NULL, NULL)
+        """))
+
+    migrate_openai_creds_table()
+
+    inspector = db.inspect(db.engine)
+    assert "id" not in _columns()
+    assert inspector.get_pk_constraint("openai_creds")["constrained_columns"] == ["company_id"]
+    assert not inspector.has_table("openai_creds_old")
+    with db.engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT company_id, assistant_id, file_id, vector_id, thread_id FROM openai_creds ORDER BY company_id"
+        )).all()
+        create_sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'openai_creds'")).scalar()
+    assert [tuple(row) for row in rows] == [
+        ("134", "asst_1", "file-1", "vs_1", "thread_1"),
+        ("135", None, None, None, None),
+    ]
+    assert "WITHOUT ROWID" in create_sql
+
+
+def test_current_table_is_left_alone(app):
+    initialize_database()
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO openai_creds (company_id, file_id) VALUES ('134', 'file-1')"))
+
+    migrate_openai_creds_table()
+
+    with db.engine.connect() as conn:
+        assert conn.execute(text("SELECT file_id FROM openai_creds WHERE company_id = '134'")).scalar() == "file-1"
+
+
+def test_missing_table_is_left_to_create_all(app):
+    migrate_openai_creds_table()
+
+    assert not db.inspect(db.engine).has_table("openai_creds")
+
+
+def test_initialize_database_upgrades_old_table(app):
+    with db.engine.begin() as conn:
+        conn.execute(text(OLD_TABLE))
+        conn.execute(text("INSERT INTO openai_creds (id, company_id, file_id) VALUES (1, '134', 'file-1')"))
+
+    initialize_database()
+
+    assert {"review_count", "latest_review_ts", "doc_hash"} <= set(_columns())
+    assert db.inspect(db.engine).has_table("chat_jobs")
@@ -0,0 +1,117 @@
+"""
+Chat response cache rules (response_cache.py)
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("cachetools")
+pytest.importorskip("flask_sqlalchemy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from array import array
+
+import response_cache
+from models import db
+from response_cache import get_exact_response, store_exact_response
+
+
+@pytest.fixture(autouse=True)
+def empty_exact_cache():
+    response_cache._exact_cache.clear()
+    yield
+    response_cache._exact_cache.clear()
+
+
+def test_exact_answer_is_replayed():
+    store_exact_response("134", "file-1", "What is the average rating?", "4.5 stars")
+
+    assert get_exact_response("134", "file-1", "What is the average rating?") == "4.5 stars"
+    assert get_exact_response("134", "file-2", "What is the average rating?") is None
+    assert get_exact_response("135", "file-1", "What is the average rating?") is None
+
+
+@pytest.mark.parametrize("question", ["Tell me more", "continue", "What about those?", "Show me another one"])
+def test_follow_ups_are_never_cached_exactly(question):
+    store_exact_response("134", "file-1", question, "depends on the thread")
+
+    assert get_exact_response("134", "file-1", question) is None
+    assert not response_cache._exact_cache
+
+
+@pytest.mark.parametrize("question", [
+    "What do customers say about the staff?",
+    "Which dishes get the most praise?",
+    "Show me 1-star reviews",
+])
+def test_informational_questions_are_semantic_cacheable(question):
+    assert response_cache.is_semantic_cacheable(question)
+
+
+@pytest.mark.parametrize("question", [
+    "Thanks",
+    "Why though?",
+    "Tell me more about the service",
+    "What else do they mention?",
+    "Can you continue the list",
+    "Summarize those complaints",
+])
+def test_short_and_follow_up_questions_are_not_semantic_cacheable(question):
+    assert not response_cache.is_semantic_cacheable(question)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Show me 1-star reviews", "Show me 5-star reviews"),
+    ("What are the best reviews?", "What are the worst reviews?"),
+    ("Reviews from last week", "Reviews from last month"),
+    ("Reviews that mention parking", "Reviews that do not mention parking"),
+])
+def test_specific_terms_tell_similar_questions_apart(first, second):
+    assert response_cache._specific_terms(first) != response_cache._specific_terms(second)
+
+
+def test_specific_terms_ignore_case_and_wording():
+    assert response_cache._specific_terms("Show me the WORST 3 reviews") == \
+        response_cache._specific_terms("which 3 reviews are the worst?")
+    assert response_cache._specific_terms("What do customers like?") == frozenset()
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask = pytest.importorskip("flask")
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'cache.sqlite'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _unit(*values):
+    norm = sum(x * x for x in values) ** 0.5
+    return array("f", (x / norm for x in values))
+
+
+def test_semantic_lookup_requires_matching_terms_and_similarity(app):
+    store = response_cache.store_semantic_response
+    store("134", "file-1", "Show me 1-star reviews", _unit(1, 0, 0), "the 1-star reviews")
+    store("134", "file-1", "What do customers say about staff?", _unit(0, 1, 0), "staff answer")
+
+    lookup = response_cache.lookup_semantic_response
+    # Nearly the same embedding, but a different star rating
+    assert lookup("134", "file-1", "Show me 5-star reviews", _unit(1, 0.01, 0)) is None
+    assert lookup("134", "file-1", "List the 1-star reviews", _unit(1, 0.01, 0)) == "the 1-star reviews"
+    # Same terms, but not similar enough
+    assert lookup("134", "file-1", "How do customers rate the food?", _unit(0.5, 0.5, 0.7)) is None
+    # Other review file
+    assert lookup("134", "file-2", "What do customers say about the staff?", _unit(0, 1, 0.01)) is None
+    assert lookup("134", "file-1", "What do customers say about the staff?", _unit(0, 1, 0.01)) == "staff answer"
+
+
+def test_follow_ups_are_not_stored_semantically(app):
+    response_cache.store_semantic_response("134", "file-1", "Tell me more about the staff", _unit(1, 0), "more")
+
+    assert db.session.query(response_cache.SemanticCache).count() == 0
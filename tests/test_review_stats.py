@@ -0,0 +1,100 @@
+"""
+Rating statistics router (review_stats.py): which questions skip the assistant, and their answers
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pymysql")
+pytest.importorskip("dbutils")
+pytest.importorskip("flask_sqlalchemy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import review_stats
+from review_stats import answer_stats_question, match_stats_question
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("How many 5 star reviews?", ("star_count", 5)),
+    ("how many 1-star ratings do we have?", ("star_count", 1)),
+    ("How many 3 stars are there", ("star_count", 3)),
+    ("What's the average rating?", ("average", None)),
+    ("what is our average star rating", ("average", None)),
+    ("Rating distribution", ("distribution", None)),
+    ("What is the star rating distribution?", ("distribution", None)),
+    ("How many reviews?", ("total", None)),
+    ("how many reviews do we have", ("total", None)),
+    ("How many reviews in total?", ("total", None)),
+])
+def test_matched_phrasings(question, expected):
+    assert match_stats_question(question) == expected
+
+
+@pytest.mark.parametrize("question", [
+    "",
+    None,
+    "How many 6 star reviews?",
+    "How many 5 star reviews mention the staff?",
+    "Why is the average rating so low?",
+    "What is the average rating this month?",
+    "How many reviews complain about parking?",
+    "Summarize the rating distribution and the main complaints",
+    "What are the common complaints?",
+])
+def test_unmatched_phrasings_go_to_the_assistant(question):
+    assert match_stats_question(question) is None
+
+
+class _Connection:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def rating_counts(monkeypatch):
+    """Answer fetch_rating_counts from a dict instead of MySQL, and count the queries"""
+    counts = {5: 6, 4: 2, 1: 2, None: 1}
+    queries = []
+
+    def fake_fetch(conn, company_id):
+        queries.append(company_id)
+        return counts
+
+    monkeypatch.setattr(review_stats, "get_mysql_connection", _Connection)
+    monkeypatch.setattr(review_stats, "fetch_rating_counts", fake_fetch)
+    return queries
+
+
+def test_free_form_question_is_not_answered(rating_counts):
+    assert answer_stats_question("134", "Cafe", "What do people like?") is None
+    assert rating_counts == []
+
+
+def test_star_count_answer(rating_counts):
+    assert answer_stats_question("134", "Cafe", "How many 5 star reviews?") == "I found 6 5-star reviews for Cafe."
+    assert answer_stats_question("134", "Cafe", "How many 3 star reviews?") == "I found 0 3-star reviews for Cafe."
+
+
+def test_average_answer(rating_counts):
+    answer = answer_stats_question("134", "Cafe", "What is the average rating?")
+    assert answer == "The reviews show an average rating of 4.0 stars for Cafe, based on 10 rated reviews."
+
+
+def test_distribution_answer(rating_counts):
+    answer = answer_stats_question("134", "Cafe", "Rating distribution")
+    assert answer.splitlines()[0] == "Rating distribution for Cafe (10 rated reviews, average 4.0 stars):"
+    assert "5 stars: 6 (60%)" in answer
+    assert "3 stars: 0 (0%)" in answer
+
+
+def test_total_answer_reuses_the_summary_count(rating_counts):
+    assert answer_stats_question("134", "Cafe", "How many reviews?", review_count=1) == "I found 1 review for Cafe."
+    assert rating_counts == []
+
+
+def test_total_answer_without_a_known_count_queries_mysql(rating_counts):
+    assert answer_stats_question("134", "Cafe", "How many reviews?") == "I found 11 reviews for Cafe."
+    assert rating_counts == ["134"]
@@ -0,0 +1,241 @@
+"""
+Vector store handling in tools.py and openai_service.py
+(tools against the real OpenAI SDK client with its HTTP layer mocked, the service against a stub client)
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+openai = pytest.importorskip("openai")
+httpx = pytest.importorskip("httpx")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from tools import add_message, create_vector_store_from_file, update_assistant
+
+
+def _vector_store(status_counts):
+    return {
+        "id": "vs_1",
+        "object": "vector_store",
+        "created_at": 0,
+        "name": "reviews_1",
+        "usage_bytes": 0,
+        "last_active_at": 0,
+        "status": "completed",
+        "metadata": {},
+        "file_counts": {
+            "in_progress": status_counts.get("in_progress", 0),
+            "completed": status_counts.get("completed", 0),
+            "failed": 0,
+            "cancelled": 0,
+            "total": 1,
+        },
+    }
+
+
+@pytest.fixture
+def client_and_requests():
+    """An OpenAI client whose HTTP calls are answered locally and recorded"""
+    requests = []
+    retrievals = {"count": 0}
+
+    def handler(request):
+        body = json.loads(request.content) if request.content else None
+        requests.append((request.method, request.url.path, body))
+
+        if request.method == "POST" and request.url.path == "/v1/vector_stores":
+            return httpx.Response(200, json=_vector_store({"in_progress": 1}))
+        if request.method == "GET" and request.url.path == "/v1/vector_stores/vs_1":
+            retrievals["count"] += 1
+            return httpx.Response(200, json=_vector_store({"completed": 1}))
+        if request.method == "DELETE" and request.url.path == "/v1/vector_stores/vs_1":
+            return httpx.Response(200, json={"id": "vs_1", "object": "vector_store.deleted", "deleted": True})
+        if request.method == "POST" and request.url.path == "/v1/assistants/asst_1":
+            return httpx.Response(200, json={
+                "id": "asst_1", "object": "assistant", "created_at": 0, "model": "gpt-4o",
+                "tools": [{"type": "file_search"}],
+                "tool_resources": body.get("tool_resources"),
+            })
+        if request.method == "POST" and request.url.path == "/v1/threads/thread_1/messages":
+            return httpx.Response(200, json={
+                "id": "msg_1", "object": "thread.message", "created_at": 0, "thread_id": "thread_1",
+                "role": "user", "status": "completed", "attachments": body.get("attachments"),
+                "content": [{"type": "text", "text": {"value": body["content"], "annotations": []}}],
+                "metadata": {},
+            })
+        return httpx.Response(404, json={"error": {"message": f"unexpected {request.method} {request.url.path}"}})
+
+    client = openai.OpenAI(
+        api_key="test",
+        max_retries=0,
+        http_client=httpx.Client(transport=httpx.MockTransport(handler)),
+    )
+    return client, requests, retrievals
+
+
+def test_create_vector_store_from_file_waits_for_indexing(client_and_requests, monkeypatch):
+    client, requests, retrievals = client_and_requests
+    monkeypatch.setattr("tools.time.sleep", lambda seconds: None)
+
+    vector_store = create_vector_store_from_file(client, "file-1", "reviews_1")
+
+    assert vector_store.id == "vs_1"
+    assert vector_store.file_counts.in_progress == 0
+    assert requests[0] == ("POST", "/v1/vector_stores", {"name": "reviews_1", "file_ids": ["file-1"]})
+    assert retrievals["count"] == 1
+
+
+def test_update_assistant_attaches_vector_store(client_and_requests):
+    client, requests, _ = client_and_requests
+
+    update_assistant(client, "asst_1", "vs_1")
+
+    method, path, body = requests[-1]
+    assert (method, path) == ("POST", "/v1/assistants/asst_1")
+    assert body["tool_resources"] == {"file_search": {"vector_store_ids": ["vs_1"]}}
+
+
+def test_add_message_sends_no_attachment_by_default(client_and_requests):
+    client, requests, _ = client_and_requests
+
+    add_message(client, "thread_1", "How many reviews?")
+
+    method, path, body = requests[-1]
+    assert (method, path) == ("POST", "/v1/threads/thread_1/messages")
+    assert body["attachments"] == []
+
+
+def test_vector_store_delete(client_and_requests):
+    client, requests, _ = client_and_requests
+
+    client.vector_stores.delete("vs_1")
+
+    assert requests[-1][:2] == ("DELETE", "/v1/vector_stores/vs_1")
+
+
+class _Resource:
+    """Stub of one OpenAI client resource (files, vector_stores, ...) that records each call"""
+
+    def __init__(self, name, calls, results):
+        self._name = name
+        self._calls = calls
+        self._results = results
+
+    def __getattr__(self, method):
+        key = f"{self._name}.{method}"
+
+        def call(*args, **kwargs):
+            self._calls.append((key, args, kwargs))
+            return self._results.get(key)
+        return call
+
+
+def _stub_client(calls):
+    """A client with only the resources this repo uses; there is no beta.vector_stores"""
+    results = {
+        "files.create": SimpleNamespace(id="file-new"),
+        "vector_stores.create": SimpleNamespace(id="vs-new", file_counts=SimpleNamespace(in_progress=0)),
+        "beta.threads.create": SimpleNamespace(id="thread-new"),
+    }
+    threads = _Resource("beta.threads", calls, results)
+    threads.messages = _Resource("beta.threads.messages", calls, results)
+    return SimpleNamespace(
+        files=_Resource("files", calls, results),
+        vector_stores=_Resource("vector_stores", calls, results),
+        beta=SimpleNamespace(assistants=_Resource("beta.assistants", calls, results), threads=threads),
+    )
+
+
+class _InlineExecutor:
+    """Runs submitted work immediately, so queued deletes can be asserted on"""
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """An OpenAIService on a stub client, with a temporary database holding one company's creds"""
+    flask = pytest.importorskip("flask")
+    pytest.importorskip("flask_sqlalchemy")
+    pytest.importorskip("pymysql")
+    pytest.importorskip("dbutils")
+    pytest.importorskip("reportlab")
+    import openai_service
+    from db_utils import invalidate_openai_creds
+    from models import db, OpenAICreds
+
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'data.sqlite'}"
+    db.init_app(app)
+
+    calls = []
+    monkeypatch.setattr(openai_service, "_setup_executor", _InlineExecutor())
+    monkeypatch.setattr(openai_service, "get_review_document", lambda *args: "Review document")
+    monkeypatch.setattr(openai_service, "create_text_file_for_vector_store", lambda *args: None)
+    service = openai_service.OpenAIService.__new__(openai_service.OpenAIService)
+    service.client = _stub_client(calls)
+    monkeypatch.setattr(service, "ensure_assistant", lambda company_name, assistant_id: (SimpleNamespace(id=assistant_id), False))
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(OpenAICreds(
+            company_id="134", assistant_id="asst_1", file_id="file-old", vector_id="vs-old",
+            thread_id="thread-old", review_count=10, latest_review_ts="2024-01-01 00:00:00"
+        ))
+        db.session.commit()
+        invalidate_openai_creds()
+        yield service, calls
+        invalidate_openai_creds()
+
+
+def test_changed_reviews_reindex_through_client_vector_stores(service):
+    service, calls = service
+    from db_utils import get_openai_creds
+
+    assistant, thread_id = service.process_chat_request(
+        "134", "How is the service?", "Cafe", lambda: [], (11, "2024-02-01 00:00:00")
+    )
+
+    names = [name for name, args, kwargs in calls]
+    assert ("vector_stores.create", (), {"name": "reviews_134", "file_ids": ["file-new"]}) in calls
+    assert ("beta.assistants.update", (), {
+        "assistant_id": "asst_1", "tool_resources": {"file_search": {"vector_store_ids": ["vs-new"]}}
+    }) in calls
+    # The replaced vector store and review file are deleted once the new ones are recorded
+    assert ("vector_stores.delete", ("vs-old",), {}) in calls
+    assert ("files.delete", ("file-old",), {}) in calls
+    assert names[-1] == "beta.threads.messages.create"
+    assert thread_id == "thread-new"
+
+    creds = get_openai_creds("134", fresh=True)
+    assert (creds.file_id, creds.vector_id, creds.thread_id) == ("file-new", "vs-new", "thread-new")
+    assert (creds.review_count, creds.latest_review_ts) == (11, "2024-02-01 00:00:00")
+
+
+def test_unchanged_reviews_touch_no_vector_store(service):
+    service, calls = service
+
+    service.process_chat_request("134", "How is the service?", "Cafe", lambda: [], (10, "2024-01-01 00:00:00"))
+
+    assert [name for name, args, kwargs in calls] == ["files.retrieve", "beta.threads.messages.create"]
+
+
+def test_company_cleanup_deletes_vector_store(service):
+    service, calls = service
+
+    report = service.cleanup_company_gpt_resources("134")
+
+    assert report["db_record_cleaned"] and not report["errors"]
+    assert ("vector_stores.delete", ("vs-old",), {}) in calls
+    assert ("files.delete", ("file-old",), {}) in calls
+    assert ("beta.assistants.delete", ("asst_1",), {}) in calls
+    assert ("beta.threads.delete", ("thread-old",), {}) in calls